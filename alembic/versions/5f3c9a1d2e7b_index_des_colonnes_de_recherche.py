@@ -0,0 +1,47 @@
+"""Index des colonnes de recherche
+
+Revision ID: 5f3c9a1d2e7b
+Revises: 23c2c69235e8
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3c9a1d2e7b'
+down_revision: Union[str, None] = '23c2c69235e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Création CONCURRENTLY sous PostgreSQL : pas de verrou d'écriture sur
+    # les tables pendant la construction (hors transaction, d'où l'autocommit)
+    with op.get_context().autocommit_block():
+        # Commandes : flux des tablettes par agence (les index composites
+        # couvrent aussi les recherches sur agence_id seul)
+        op.create_index('ix_commandes_agence_id_date_creation', 'commandes', ['agence_id', 'date_creation'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_commandes_agence_id_status', 'commandes', ['agence_id', 'status'], unique=False, postgresql_concurrently=True)
+        op.create_index(op.f('ix_commandes_createur_id'), 'commandes', ['createur_id'], unique=False, postgresql_concurrently=True)
+        op.create_index(op.f('ix_commandes_client_id'), 'commandes', ['client_id'], unique=False, postgresql_concurrently=True)
+        # Lignes d'une commande
+        op.create_index(op.f('ix_ligne_commandes_commande_id'), 'ligne_commandes', ['commande_id'], unique=False, postgresql_concurrently=True)
+        # Connexion par email et sessions d'un utilisateur
+        op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=False, postgresql_concurrently=True)
+        op.create_index(op.f('ix_sessions_user_id'), 'sessions', ['user_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sessions_user_id'), table_name='sessions')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index(op.f('ix_ligne_commandes_commande_id'), table_name='ligne_commandes')
+    op.drop_index(op.f('ix_commandes_client_id'), table_name='commandes')
+    op.drop_index(op.f('ix_commandes_createur_id'), table_name='commandes')
+    op.drop_index('ix_commandes_agence_id_status', table_name='commandes')
+    op.drop_index('ix_commandes_agence_id_date_creation', table_name='commandes')
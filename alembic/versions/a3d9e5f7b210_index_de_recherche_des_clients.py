@@ -0,0 +1,44 @@
+"""Index de recherche des clients
+
+Revision ID: a3d9e5f7b210
+Revises: f2a6c8e1b954
+Create Date: 2026-10-18 19:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d9e5f7b210'
+down_revision: Union[str, None] = 'f2a6c8e1b954'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLONNES = ('nom', 'prenom')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Le préfixe de téléphone utilise l'index unique de telephone_normalise
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # GIN pg_trgm : LIKE 'préfixe%' et similarité (%), construit sans
+        # bloquer les écritures sur clients
+        with op.get_context().autocommit_block():
+            for colonne in COLONNES:
+                op.create_index(
+                    f'ix_clients_{colonne}_recherche', 'clients', [sa.text(f'lower({colonne}) gin_trgm_ops')],
+                    unique=False, postgresql_using='gin', postgresql_concurrently=True
+                )
+    else:
+        for colonne in COLONNES:
+            op.create_index(f'ix_clients_{colonne}_recherche', 'clients', [sa.text(f'lower({colonne})')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for colonne in reversed(COLONNES):
+        op.drop_index(f'ix_clients_{colonne}_recherche', table_name='clients')
@@ -0,0 +1,62 @@
+"""Outbox des notifications
+
+Revision ID: b6e1f4c8d327
+Revises: a3d9e5f7b210
+Create Date: 2026-10-18 21:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e1f4c8d327'
+down_revision: Union[str, None] = 'a3d9e5f7b210'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'notification_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('agence_id', sa.Integer(), nullable=False),
+        sa.Column('titre', sa.String(), nullable=False),
+        sa.Column('corps', sa.String(), nullable=False),
+        sa.Column('commande_id', sa.Integer(), nullable=True),
+        sa.Column('type', sa.String(), nullable=True),
+        sa.Column('donnees', sa.JSON(), nullable=False),
+        sa.Column('date_creation', sa.DateTime(), nullable=False),
+        sa.Column('prochain_essai', sa.DateTime(), nullable=False),
+        sa.Column('tentatives', sa.Integer(), nullable=False),
+        sa.Column('date_envoi', sa.DateTime(), nullable=True),
+        sa.Column('erreur', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['agence_id'], ['agences.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_notification_outbox_en_attente',
+        'notification_outbox',
+        ['prochain_essai', 'id'],
+        unique=False,
+        postgresql_where=sa.text('date_envoi IS NULL'),
+        sqlite_where=sa.text('date_envoi IS NULL')
+    )
+    op.create_index(
+        'ix_notification_outbox_commande_en_attente',
+        'notification_outbox',
+        ['agence_id', 'commande_id', 'id'],
+        unique=False,
+        postgresql_where=sa.text('date_envoi IS NULL'),
+        sqlite_where=sa.text('date_envoi IS NULL')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notification_outbox_commande_en_attente', table_name='notification_outbox')
+    op.drop_index('ix_notification_outbox_en_attente', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
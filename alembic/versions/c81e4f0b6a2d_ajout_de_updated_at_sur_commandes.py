@@ -0,0 +1,34 @@
+"""Ajout de updated_at sur commandes
+
+Revision ID: c81e4f0b6a2d
+Revises: 5f3c9a1d2e7b
+Create Date: 2026-10-18 17:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81e4f0b6a2d'
+down_revision: Union[str, None] = '5f3c9a1d2e7b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('commandes', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Dernière écriture connue des commandes existantes
+    op.execute("UPDATE commandes SET updated_at = COALESCE(date_reception, date_creation)")
+    with op.batch_alter_table('commandes') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_commandes_agence_id_updated_at', 'commandes', ['agence_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_commandes_agence_id_updated_at', table_name='commandes')
+    op.drop_column('commandes', 'updated_at')
@@ -0,0 +1,43 @@
+"""Cumul journalier des commandes par agence
+
+Revision ID: e4b7d2a9c013
+Revises: c81e4f0b6a2d
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7d2a9c013'
+down_revision: Union[str, None] = 'c81e4f0b6a2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'statistiques_agences_jour',
+        sa.Column('agence_id', sa.Integer(), nullable=False),
+        sa.Column('jour', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('nombre_commandes', sa.Integer(), nullable=False),
+        sa.Column('montant_total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['agence_id'], ['agences.id'], ),
+        sa.PrimaryKeyConstraint('agence_id', 'jour', 'status')
+    )
+    # Cumul des commandes existantes (équivalent de `python -m callCenter.rollup rebuild`)
+    op.execute(
+        "INSERT INTO statistiques_agences_jour (agence_id, jour, status, nombre_commandes, montant_total) "
+        "SELECT agence_id, date(date_creation), status, count(id), sum(montant_total) "
+        "FROM commandes GROUP BY agence_id, date(date_creation), status"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('statistiques_agences_jour')
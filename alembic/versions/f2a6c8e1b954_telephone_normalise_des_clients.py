@@ -0,0 +1,58 @@
+"""Téléphone normalisé des clients
+
+Revision ID: f2a6c8e1b954
+Revises: e4b7d2a9c013
+Create Date: 2026-10-18 18:50:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a6c8e1b954'
+down_revision: Union[str, None] = 'e4b7d2a9c013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _normaliser(telephone):
+    # Copie figée de telephone.normaliser_telephone au moment de la migration
+    chiffres = re.sub(r"\D", "", telephone or "")
+    if chiffres.startswith("00"):
+        chiffres = chiffres[2:]
+    if chiffres.startswith("224") and len(chiffres) > 9:
+        chiffres = chiffres[3:]
+    return chiffres
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('clients', sa.Column('telephone_normalise', sa.String(), nullable=True))
+
+    clients = sa.table('clients', sa.column('id', sa.Integer), sa.column('telephone', sa.String),
+                       sa.column('telephone_normalise', sa.String))
+    connexion = op.get_bind()
+    # Le plus ancien client garde le numéro ; les doublons restent à NULL
+    # et doivent être fusionnés à la main (leurs commandes les référencent)
+    vus = {}
+    for client_id, telephone in connexion.execute(sa.select(clients.c.id, clients.c.telephone).order_by(clients.c.id)):
+        vus.setdefault(_normaliser(telephone), client_id)
+    # Les numéros vides restent à NULL
+    lignes = [{'b_id': client_id, 'b_tel': telephone} for telephone, client_id in vus.items() if telephone]
+    if lignes:
+        connexion.execute(
+            clients.update().where(clients.c.id == sa.bindparam('b_id')).values(telephone_normalise=sa.bindparam('b_tel')),
+            lignes
+        )
+
+    op.create_index('ix_clients_telephone_normalise', 'clients', ['telephone_normalise'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_clients_telephone_normalise', table_name='clients')
+    op.drop_column('clients', 'telephone_normalise')
@@ -0,0 +1,122 @@
+"""
+Outils communs aux benchmarks de l'API.
+
+Les benchmarks tournent sur une base dédiée (BENCHMARK_DATABASE_URL, SQLite
+temporaire par défaut) et jamais sur celle de SQLALCHEMY_DATABASE_URL_RFC_CALL :
+les tables y sont recréées à chaque exécution.
+
+Exécution depuis la racine du dépôt :
+    python -m benchmarks.bench_submit_order
+"""
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+os.environ["SQLALCHEMY_DATABASE_URL_RFC_CALL"] = os.getenv(
+    "BENCHMARK_DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'rfc_benchmark.db')}"
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+from models import Agence, Client, User  # noqa: E402
+from utiles import hash_password  # noqa: E402
+
+MOT_DE_PASSE = "Benchmark123"
+
+
+def reinitialiser_base():
+    """Recrée toutes les tables de la base de benchmark."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def creer_donnees_de_base(nombre_agents=1):
+    """Crée une agence, des agents et un client ; retourne leurs identifiants."""
+    db = SessionLocal()
+    try:
+        agence = Agence(nom="Agence Bench", adresse="Conakry", telephone="+224600000000", est_active=True)
+        db.add(agence)
+        db.flush()
+
+        mot_de_passe = hash_password(MOT_DE_PASSE)
+        agents = [
+            User(
+                agence_id=agence.id,
+                nom="Bench",
+                prenom=f"Agent{i}",
+                email=f"agent{i}@bench.rfc",
+                password=mot_de_passe,
+                telephone="+224600000001",
+                role="admin",
+                derniere_connexion=datetime.utcnow(),
+                derniere_deconnexion=datetime.utcnow()
+            ) for i in range(nombre_agents)
+        ]
+        db.add_all(agents)
+
+        client = Client(
+            nom="Client",
+            prenom="Bench",
+            telephone="+224629553504",
+            adresse="Kaloum",
+            date_creation=datetime.utcnow()
+        )
+        db.add(client)
+        db.commit()
+        return {
+            "agence_id": agence.id,
+            "user_ids": [agent.id for agent in agents],
+            "client_id": client.id
+        }
+    finally:
+        db.close()
+
+
+def installer_faux_fcm():
+    """Remplace FCM par un transport en mémoire pour le relais de l'outbox."""
+    from callCenter.dispatch import FakeFCMTransport
+    from callCenter.outbox import relais_outbox
+
+    transport = FakeFCMTransport()
+    relais_outbox.transport = transport
+    return transport
+
+
+def client_api():
+    """
+    Retourne un TestClient de l'application dont les notifications partent vers
+    un faux FCM en mémoire. À utiliser comme gestionnaire de contexte pour que
+    le lifespan (relais de l'outbox) soit exécuté.
+    """
+    from main import app
+
+    installer_faux_fcm()
+    return TestClient(app)
+
+
+def resumer(durees, duree_totale):
+    """Débit et percentiles (en ms) d'une série de durées en secondes."""
+    durees_ms = sorted(d * 1000 for d in durees)
+    quantiles = statistics.quantiles(durees_ms, n=100) if len(durees_ms) > 1 else durees_ms * 99
+    return {
+        "requetes": len(durees_ms),
+        "debit_par_seconde": round(len(durees_ms) / duree_totale, 1) if duree_totale else None,
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+    }
+
+
+def chronometrer(appel, repetitions):
+    """Exécute `appel` plusieurs fois et retourne (durées, durée totale)."""
+    durees = []
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        appel()
+        durees.append(time.perf_counter() - t0)
+    return durees, time.perf_counter() - debut
@@ -0,0 +1,114 @@
+"""
+Latence de la recherche de clients (/clients/search) sur un jeu de données
+généré, comparée à un objectif de p95.
+
+    python -m benchmarks.bench_client_search --clients 1000000 --p95-cible-ms 50
+
+Le code de sortie est 1 si une des familles de requêtes dépasse l'objectif.
+Sous PostgreSQL (BENCHMARK_DATABASE_URL), les index GIN pg_trgm sont utilisés.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, text
+
+from benchmarks._commun import reinitialiser_base, resumer
+from callCenter.recherche import requete_recherche_clients
+from database import engine
+from models import Client
+
+NOMS = [
+    "Diallo", "Camara", "Bah", "Barry", "Sow", "Keita", "Conde", "Toure", "Sylla", "Kaba",
+    "Soumah", "Bangoura", "Cisse", "Kourouma", "Sidibe", "Doumbouya", "Fofana", "Traore",
+]
+PRENOMS = [
+    "Awa", "Mamadou", "Fatoumata", "Ibrahima", "Mariama", "Alpha", "Aissatou", "Ousmane",
+    "Kadiatou", "Sekou", "Hawa", "Amadou", "Nene", "Lansana", "Djenab", "Moussa",
+]
+
+
+def generer_clients(nombre, taille_lot=20000):
+    """Insère `nombre` clients aux numéros uniques (suffixe numérique sur les noms pour les varier)."""
+    for debut in range(0, nombre, taille_lot):
+        with engine.begin() as conn:
+            conn.execute(insert(Client), [
+                {
+                    "nom": f"{random.choice(NOMS)}{'' if i % 4 else i % 997}",
+                    "prenom": random.choice(PRENOMS),
+                    "telephone": f"+224{600000000 + i}",
+                    "telephone_normalise": str(600000000 + i),
+                    "adresse": "Conakry",
+                    "date_creation": datetime(2026, 1, 1),
+                } for i in range(debut, min(debut + taille_lot, nombre))
+            ])
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def termes(nombre_clients):
+    """Termes saisis par les agents : numéro partiel, début de nom, nom + prénom, faute de frappe."""
+    nom, prenom = random.choice(NOMS), random.choice(PRENOMS)
+    return {
+        "prefixe_telephone": str(600000000 + random.randrange(nombre_clients))[:6],
+        "prefixe_telephone_international": "+224 " + str(600000000 + random.randrange(nombre_clients))[:5],
+        "prefixe_nom": nom[:3].lower(),
+        "nom_et_prenom": f"{nom.lower()} {prenom[:2].lower()}",
+        "nom_approche": nom[:-1].lower() + "x",
+    }
+
+
+def plan(conn, requete):
+    compilee = requete.compile(engine, compile_kwargs={"literal_binds": True})
+    if engine.dialect.name == "sqlite":
+        return [ligne[-1] for ligne in conn.execute(text(f"EXPLAIN QUERY PLAN {compilee}"))]
+    return [ligne[0] for ligne in conn.execute(text(f"EXPLAIN ANALYZE {compilee}"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=1000000, help="Nombre de clients générés")
+    parser.add_argument("--repetitions", type=int, default=300, help="Recherches par famille de termes")
+    parser.add_argument("--limite", type=int, default=20, help="Paramètre limit des recherches")
+    parser.add_argument("--p95-cible-ms", type=float, default=50.0, help="Objectif de p95 par famille")
+    args = parser.parse_args()
+
+    random.seed(42)
+    reinitialiser_base()
+    debut = time.perf_counter()
+    generer_clients(args.clients)
+    duree_generation = time.perf_counter() - debut
+
+    resultats = {}
+    with engine.connect() as conn:
+        for famille in termes(args.clients):
+            durees = []
+            debut = time.perf_counter()
+            for _ in range(args.repetitions):
+                requete = requete_recherche_clients(termes(args.clients)[famille], args.limite, engine.dialect.name)
+                t0 = time.perf_counter()
+                conn.execute(requete).fetchall()
+                durees.append(time.perf_counter() - t0)
+            mesure = resumer(durees, time.perf_counter() - debut)
+            exemple = requete_recherche_clients(termes(args.clients)[famille], args.limite, engine.dialect.name)
+            resultats[famille] = {
+                **mesure,
+                "objectif_atteint": mesure["p95_ms"] <= args.p95_cible_ms,
+                "plan": plan(conn, exemple),
+            }
+
+    print(json.dumps({
+        "benchmark": "client_search",
+        "dialecte": engine.dialect.name,
+        "jeu_de_donnees": {"clients": args.clients, "generation_secondes": round(duree_generation, 1)},
+        "p95_cible_ms": args.p95_cible_ms,
+        "resultats": resultats,
+    }, indent=2, ensure_ascii=False))
+    sys.exit(0 if all(r["objectif_atteint"] for r in resultats.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
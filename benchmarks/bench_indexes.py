@@ -0,0 +1,174 @@
+"""
+Plans d'exécution et latence des requêtes chaudes avant/après les index de
+la révision 5f3c9a1d2e7b, sur un jeu de données généré.
+
+    python -m benchmarks.bench_indexes --commandes 200000 --agences 50
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+from benchmarks._commun import reinitialiser_base, resumer
+from database import engine
+from models import Agence, Base, Client, Commande, LigneCommande, User, UserSession
+
+STATUTS = ["envoyée", "reçue", "en préparation", "prête", "livrée"]
+
+# Requêtes mesurées : celles des endpoints les plus appelés
+REQUETES = {
+    "flux_agence": (
+        "SELECT * FROM commandes WHERE agence_id = :agence_id "
+        "ORDER BY date_creation DESC, id DESC LIMIT 50"
+    ),
+    "flux_agence_par_statut": (
+        "SELECT * FROM commandes WHERE agence_id = :agence_id AND status = 'envoyée' LIMIT 50"
+    ),
+    "commandes_utilisateur": "SELECT * FROM commandes WHERE createur_id = :user_id LIMIT 50",
+    "commandes_client": "SELECT * FROM commandes WHERE client_id = :client_id",
+    "lignes_commande": "SELECT * FROM ligne_commandes WHERE commande_id = :commande_id",
+    "login_par_email": "SELECT * FROM users WHERE email = :email",
+    "sessions_utilisateur": "SELECT * FROM sessions WHERE user_id = :user_id",
+}
+
+
+def generer_donnees(nombre_commandes, nombre_agences, taille_lot=10000):
+    """Insère agences, agents, clients, commandes (3 lignes chacune) et sessions."""
+    maintenant = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Agence), [
+            {"nom": f"Agence {i}", "adresse": "Conakry", "telephone": "+224600000000", "est_active": True}
+            for i in range(nombre_agences)
+        ])
+        conn.execute(insert(User), [
+            {
+                "agence_id": i % nombre_agences + 1, "nom": "Agent", "prenom": str(i),
+                "email": f"agent{i}@bench.rfc", "password": "x", "telephone": "+224600000001",
+                "role": "agent_call_center", "derniere_connexion": maintenant, "derniere_deconnexion": maintenant
+            } for i in range(nombre_agences * 10)
+        ])
+        conn.execute(insert(UserSession), [
+            {"user_id": i % (nombre_agences * 10) + 1, "heure_connexion": maintenant,
+             "nombre_commande_creer": 0, "nombre_commande_traiter": 0}
+            for i in range(nombre_agences * 200)
+        ])
+        conn.execute(insert(Client), [
+            {"nom": "Client", "prenom": str(i), "telephone": f"+224{600000000 + i}",
+             "adresse": "Kaloum", "date_creation": maintenant}
+            for i in range(max(nombre_commandes // 5, 1))
+        ])
+
+    nombre_clients = max(nombre_commandes // 5, 1)
+    for debut in range(0, nombre_commandes, taille_lot):
+        fin = min(debut + taille_lot, nombre_commandes)
+        with engine.begin() as conn:
+            conn.execute(insert(Commande), [
+                {
+                    "id": i + 1,
+                    "client_id": random.randint(1, nombre_clients),
+                    "agence_id": random.randint(1, nombre_agences),
+                    "createur_id": random.randint(1, nombre_agences * 10),
+                    "recepteur_id": random.randint(1, nombre_agences * 10),
+                    "date_creation": maintenant - timedelta(minutes=i),
+                    "status": random.choice(STATUTS),
+                    "montant_total": 3000,
+                    "notes": ""
+                } for i in range(debut, fin)
+            ])
+            conn.execute(insert(LigneCommande), [
+                {
+                    "commande_id": i + 1, "nom_article": "Article", "reference_article": f"REF-{j}",
+                    "quantite": 1, "prix_unitaire": 1000, "sous_totaux": 1000
+                } for i in range(debut, fin) for j in range(3)
+            ])
+
+
+def parametres_aleatoires(nombre_commandes, nombre_agences):
+    return {
+        "agence_id": random.randint(1, nombre_agences),
+        "user_id": random.randint(1, nombre_agences * 10),
+        "client_id": random.randint(1, max(nombre_commandes // 5, 1)),
+        "commande_id": random.randint(1, nombre_commandes),
+        "email": f"agent{random.randint(0, nombre_agences * 10 - 1)}@bench.rfc",
+    }
+
+
+def plan(conn, sql, parametres):
+    """Plan d'exécution de la requête (EXPLAIN QUERY PLAN sous SQLite)."""
+    if engine.dialect.name == "sqlite":
+        lignes = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), parametres).fetchall()
+        return [ligne[-1] for ligne in lignes]
+    lignes = conn.execute(text(f"EXPLAIN ANALYZE {sql}"), parametres).fetchall()
+    return [ligne[0] for ligne in lignes]
+
+
+def mesurer(nombre_commandes, nombre_agences, repetitions):
+    resultats = {}
+    with engine.connect() as conn:
+        for nom, sql in REQUETES.items():
+            parametres = parametres_aleatoires(nombre_commandes, nombre_agences)
+            durees = []
+            debut = time.perf_counter()
+            for _ in range(repetitions):
+                t0 = time.perf_counter()
+                conn.execute(text(sql), parametres_aleatoires(nombre_commandes, nombre_agences)).fetchall()
+                durees.append(time.perf_counter() - t0)
+            resultats[nom] = {
+                **resumer(durees, time.perf_counter() - debut),
+                "plan": plan(conn, sql, parametres),
+            }
+    return resultats
+
+
+# Index ajoutés par la révision 5f3c9a1d2e7b
+INDEX_REVISION = {
+    "ix_commandes_agence_id_date_creation",
+    "ix_commandes_agence_id_status",
+    "ix_commandes_createur_id",
+    "ix_commandes_client_id",
+    "ix_ligne_commandes_commande_id",
+    "ix_users_email",
+    "ix_sessions_user_id",
+}
+
+
+def index_de_la_revision():
+    return [
+        index for table in Base.metadata.sorted_tables for index in table.indexes
+        if index.name in INDEX_REVISION
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commandes", type=int, default=200000, help="Nombre de commandes générées")
+    parser.add_argument("--agences", type=int, default=50, help="Nombre d'agences")
+    parser.add_argument("--repetitions", type=int, default=200, help="Exécutions par requête")
+    args = parser.parse_args()
+
+    random.seed(42)
+    reinitialiser_base()
+    generer_donnees(args.commandes, args.agences)
+
+    for index in index_de_la_revision():
+        index.drop(bind=engine)
+    avant = mesurer(args.commandes, args.agences, args.repetitions)
+
+    for index in index_de_la_revision():
+        index.create(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    apres = mesurer(args.commandes, args.agences, args.repetitions)
+
+    print(json.dumps({
+        "benchmark": "indexes",
+        "jeu_de_donnees": {"commandes": args.commandes, "agences": args.agences},
+        "resultats": {"avant": avant, "apres": apres},
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
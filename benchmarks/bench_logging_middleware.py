@@ -0,0 +1,67 @@
+"""
+Surcoût du middleware de journalisation HTTP (log_requests) par requête.
+
+Mesure d'une part le coût d'un appel à log_http_request (le thread appelant ne
+fait que déposer l'enregistrement dans la file), d'autre part la latence d'un
+endpoint trivial avec et sans le middleware.
+
+    python -m benchmarks.bench_logging_middleware --requetes 5000
+"""
+import argparse
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import benchmarks._commun  # noqa: F401  (base de benchmark)
+from benchmarks._commun import chronometrer, resumer
+from logger import log_http_request
+from main import log_requests
+
+
+def application(avec_middleware):
+    app = FastAPI()
+
+    @app.get("/ping/{valeur}")
+    def ping(valeur: int):
+        return {"valeur": valeur}
+
+    if avec_middleware:
+        app.middleware("http")(log_requests)
+    return app
+
+
+def cout_appel_log(appels):
+    """Durée moyenne (µs) d'un appel à log_http_request côté appelant."""
+    request = Request({
+        "type": "http", "method": "GET", "path": "/ping/1", "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 1234), "server": ("bench", 80), "scheme": "http",
+    })
+    debut = time.perf_counter()
+    for i in range(appels):
+        log_http_request(request, 200, 0.001, f"bench-{i}")
+    duree = time.perf_counter() - debut
+    return round(duree / appels * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requetes", type=int, default=5000, help="Requêtes par scénario")
+    args = parser.parse_args()
+
+    resultats = {"log_http_request_us_par_appel": cout_appel_log(args.requetes)}
+    for nom, avec_middleware in (("sans_middleware", False), ("avec_middleware", True)):
+        client = TestClient(application(avec_middleware))
+        client.get("/ping/0")
+        resultats[nom] = resumer(*chronometrer(lambda: client.get("/ping/1"), args.requetes))
+    resultats["surcout_p50_ms"] = round(
+        resultats["avec_middleware"]["p50_ms"] - resultats["sans_middleware"]["p50_ms"], 3
+    )
+
+    print(json.dumps({"benchmark": "logging_middleware", "resultats": resultats}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
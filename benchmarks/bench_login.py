@@ -0,0 +1,67 @@
+"""
+Tempête de connexions : débit de POST /login par cœur sous forte concurrence
+(changement d'équipe, des centaines d'agents se connectent en même temps).
+
+    python -m benchmarks.bench_login --agents 200 --concurrence 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from benchmarks._commun import MOT_DE_PASSE, creer_donnees_de_base, reinitialiser_base, resumer
+
+
+async def tempete(app, nombre_agents, concurrence):
+    """Connecte chaque agent une fois, `concurrence` requêtes à la fois."""
+    limite = asyncio.Semaphore(concurrence)
+    durees = []
+    statuts = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def connecter(i):
+            async with limite:
+                t0 = time.perf_counter()
+                response = await client.post(
+                    "/login",
+                    data={"username": f"agent{i}@bench.rfc", "password": MOT_DE_PASSE}
+                )
+                statuts[response.status_code] = statuts.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    durees.append(time.perf_counter() - t0)
+
+        debut = time.perf_counter()
+        await asyncio.gather(*(connecter(i) for i in range(nombre_agents)))
+        duree_totale = time.perf_counter() - debut
+
+    return durees, duree_totale, statuts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=200, help="Nombre d'agents qui se connectent")
+    parser.add_argument("--concurrence", type=int, default=100, help="Connexions simultanées")
+    args = parser.parse_args()
+
+    reinitialiser_base()
+    creer_donnees_de_base(nombre_agents=args.agents)
+
+    import utiles
+    from main import app
+
+    durees, duree_totale, statuts = asyncio.run(tempete(app, args.agents, args.concurrence))
+    resultat = resumer(durees, duree_totale) if durees else {}
+    coeurs = min(utiles.BCRYPT_WORKERS, os.cpu_count() or 1)
+    if durees:
+        resultat["debit_par_coeur"] = round(len(durees) / duree_totale / coeurs, 2)
+    resultat["statuts"] = statuts
+    resultat["bcrypt_workers"] = utiles.BCRYPT_WORKERS
+
+    print(json.dumps({"benchmark": "login", "resultats": {"tempete_connexions": resultat}}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
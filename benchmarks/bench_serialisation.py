@@ -0,0 +1,88 @@
+"""
+Coût de la sérialisation des grandes listes de commandes : chemin FastAPI
+standard (validation response_model, jsonable_encoder, json) contre l'encodage
+direct orjson de callCenter/serialisation.py.
+
+    python -m benchmarks.bench_serialisation --commandes 500 --lignes 5
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from fastapi.routing import serialize_response
+from sqlalchemy import insert
+
+from benchmarks._commun import chronometrer, client_api, creer_donnees_de_base, reinitialiser_base, resumer
+from callCenter import serialisation
+from database import engine
+from models import Commande, LigneCommande
+
+ROUTE = "/commandes/agence/{agence_id}"
+
+
+def generer_commandes(ids, nombre_commandes, nombre_lignes):
+    maintenant = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Commande), [
+            {
+                "id": i + 1, "client_id": ids["client_id"], "agence_id": ids["agence_id"],
+                "createur_id": ids["user_ids"][0], "recepteur_id": ids["user_ids"][0],
+                "date_creation": maintenant - timedelta(seconds=i), "status": "envoyée",
+                "montant_total": 1500 * nombre_lignes, "notes": "Benchmark"
+            } for i in range(nombre_commandes)
+        ])
+        conn.execute(insert(LigneCommande), [
+            {
+                "commande_id": i + 1, "nom_article": f"Article {j}", "reference_article": f"REF-{j}",
+                "quantite": 1, "prix_unitaire": 1500, "sous_totaux": 1500
+            } for i in range(nombre_commandes) for j in range(nombre_lignes)
+        ])
+
+
+def encodage_standard(champ, contenu):
+    """Ce que fait FastAPI quand l'endpoint retourne un dict : validation puis JSONResponse."""
+    valide = asyncio.run(serialize_response(field=champ, response_content=contenu, is_coroutine=True))
+    return json.dumps(valide, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commandes", type=int, default=500, help="Commandes de l'agence (taille de la page)")
+    parser.add_argument("--lignes", type=int, default=5, help="Lignes par commande")
+    parser.add_argument("--repetitions", type=int, default=50, help="Mesures par mode")
+    args = parser.parse_args()
+
+    reinitialiser_base()
+    ids = creer_donnees_de_base()
+    generer_commandes(ids, args.commandes, args.lignes)
+    url = ROUTE.format(agence_id=ids["agence_id"])
+    params = {"limit": min(args.commandes, 500)}
+
+    resultats = {}
+    with client_api() as client:
+        # Requête HTTP complète, base comprise
+        for mode, rapide in (("http_standard", False), ("http_orjson", True)):
+            serialisation.JSON_RAPIDE = rapide
+            resultats[mode] = resumer(*chronometrer(lambda: client.get(url, params=params), args.repetitions))
+
+        # Sérialisation seule, sur le contenu retourné par l'endpoint
+        from main import app
+        champ = next(route for route in app.routes if getattr(route, "path", None) == ROUTE).response_field
+        contenu = client.get(url, params=params).json()
+        contenu["items"] = [
+            {**item, "date_creation": datetime.fromisoformat(item["date_creation"])} for item in contenu["items"]
+        ]
+        assert json.loads(encodage_standard(champ, contenu)) == json.loads(serialisation.orjson.dumps(contenu))
+        resultats["serialisation_standard"] = resumer(*chronometrer(lambda: encodage_standard(champ, contenu), args.repetitions))
+        resultats["serialisation_orjson"] = resumer(*chronometrer(lambda: serialisation.orjson.dumps(contenu), args.repetitions))
+
+    print(json.dumps({
+        "benchmark": "serialisation",
+        "page": {"commandes": params["limit"], "lignes_par_commande": args.lignes},
+        "resultats": resultats,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Débit de POST /commande (commandes/seconde) selon le nombre de lignes par commande.
+
+    python -m benchmarks.bench_submit_order --commandes 200 --lignes 1,10,100
+"""
+import argparse
+import json
+
+from benchmarks._commun import (
+    chronometrer, client_api, creer_donnees_de_base, reinitialiser_base, resumer
+)
+
+
+def mesurer(client, ids, nombre_lignes, commandes):
+    """Soumet `commandes` commandes de `nombre_lignes` lignes et résume les durées."""
+    payload = {
+        "client_id": ids["client_id"],
+        "agence_id": ids["agence_id"],
+        "createur_id": ids["user_ids"][0],
+        "recepteur_id": ids["user_ids"][0],
+        "notes": "Benchmark",
+        "lignes_commandes": [
+            {
+                "nom_article": f"Article {i}",
+                "reference_article": f"REF-{i}",
+                "quantite": 2,
+                "prix_unitaire": 1500
+            } for i in range(nombre_lignes)
+        ]
+    }
+
+    def soumettre():
+        response = client.post("/commande", json=payload)
+        assert response.status_code == 200, response.text
+
+    return resumer(*chronometrer(soumettre, commandes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commandes", type=int, default=200, help="Commandes soumises par scénario")
+    parser.add_argument("--lignes", default="1,10,100", help="Nombres de lignes par commande")
+    args = parser.parse_args()
+
+    reinitialiser_base()
+    ids = creer_donnees_de_base()
+
+    resultats = {}
+    with client_api() as client:
+        for nombre_lignes in (int(n) for n in args.lignes.split(",")):
+            resultats[f"{nombre_lignes}_lignes"] = mesurer(client, ids, nombre_lignes, args.commandes)
+
+    print(json.dumps({"benchmark": "submit_order", "resultats": resultats}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
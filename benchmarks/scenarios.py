@@ -0,0 +1,338 @@
+"""
+Suite de scénarios de charge sur les chemins chauds de l'API.
+
+Chaque scénario simule des utilisateurs concurrents contre l'application
+(ASGI, sans réseau), lifespan compris, avec un faux FCM :
+
+- tempete_connexions : tous les agents se connectent en même temps ;
+- appel_client : recherche de l'appelant (numéro, début de numéro) puis
+  soumission de sa commande ;
+- tablettes : vérification de la tablette, synchronisation des changements
+  et mises à jour de statut ;
+- back_office : listes de référence, commandes d'une agence et rapport.
+
+Le résultat (JSON) donne, par scénario et par endpoint, le débit et les
+p50/p95/p99 ; il contient le commit et les paramètres pour comparer deux
+exécutions. Les données et les choix des utilisateurs simulés sont tirés
+d'une graine fixe.
+
+    python -m benchmarks.scenarios --sortie avant.json
+    python -m benchmarks.scenarios --reference avant.json --seuil 20
+
+Avec --reference, le code de sortie est 1 si le p95 d'un endpoint dépasse
+celui de la référence de plus de --seuil % (et de plus de --plancher-ms).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import httpx
+
+from benchmarks._commun import (
+    MOT_DE_PASSE, creer_donnees_de_base, installer_faux_fcm, reinitialiser_base, resumer
+)
+from benchmarks.bench_client_search import generer_clients
+from database import SessionLocal, engine
+from models import Commande, LigneCommande, Tablette
+
+VERSION_FORMAT = 1
+STATUTS = ["reçue", "en_preparation", "prete", "livree"]
+
+
+class Mesures:
+    """Durées et statuts HTTP par endpoint (méthode et route, sans les paramètres)."""
+
+    def __init__(self):
+        self.durees = defaultdict(list)
+        self.statuts = defaultdict(Counter)
+
+    async def requete(self, client, methode, route, url=None, **kwargs):
+        t0 = time.perf_counter()
+        response = await client.request(methode, url or route, **kwargs)
+        duree = time.perf_counter() - t0
+        cle = f"{methode} {route}"
+        self.statuts[cle][response.status_code] += 1
+        if response.status_code < 400:
+            self.durees[cle].append(duree)
+        return response
+
+    def resultats(self, duree_totale):
+        return {
+            cle: {
+                **(resumer(self.durees[cle], duree_totale) if self.durees[cle] else {"requetes": 0}),
+                "statuts": {str(code): nombre for code, nombre in sorted(statuts.items())},
+            }
+            for cle, statuts in sorted(self.statuts.items())
+        }
+
+
+##===============================================================##
+##                          Données                              ##
+##===============================================================##
+def generer_commandes(ids, nombre, lignes=3):
+    """Commandes existantes de l'agence (identifiants attribués par la base)."""
+    db = SessionLocal()
+    try:
+        maintenant = datetime.utcnow()
+        for i in range(nombre):
+            commande = Commande(
+                client_id=ids["client_id"], agence_id=ids["agence_id"],
+                createur_id=ids["user_ids"][0], recepteur_id=ids["user_ids"][0],
+                date_creation=maintenant, status="envoyée", montant_total=1500 * lignes, notes="Benchmark"
+            )
+            commande.lignecommande = [
+                LigneCommande(
+                    nom_article=f"Article {j}", reference_article=f"REF-{j}",
+                    quantite=1, prix_unitaire=1500, sous_totaux=1500
+                ) for j in range(lignes)
+            ]
+            db.add(commande)
+        db.commit()
+        return [commande_id for (commande_id,) in db.query(Commande.id).order_by(Commande.id)]
+    finally:
+        db.close()
+
+
+def preparer(args):
+    """Recrée la base de benchmark et ses données ; retourne le contexte des scénarios."""
+    from callCenter import rollup
+    from utiles import create_access_token
+
+    random.seed(args.graine)
+    reinitialiser_base()
+    ids = creer_donnees_de_base(nombre_agents=args.agents)
+    generer_clients(args.clients)
+    commande_ids = generer_commandes(ids, args.commandes)
+
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Tablette(numero_serie=f"BENCH-{i}", agence_id=ids["agence_id"], est_active=True,
+                     derniere_syncro=datetime.utcnow())
+            for i in range(args.utilisateurs)
+        ])
+        db.commit()
+        rollup.reconstruire(db)
+    finally:
+        db.close()
+
+    jeton = create_access_token(data={"user_id": ids["user_ids"][0], "role": "admin"})
+    return {
+        **ids,
+        "commande_ids": commande_ids,
+        "entetes": {"Authorization": f"Bearer {jeton}"},
+    }
+
+
+##===============================================================##
+##                         Scénarios                             ##
+##===============================================================##
+async def tempete_connexions(client, mesures, contexte, args):
+    limite = asyncio.Semaphore(args.utilisateurs)
+
+    async def connecter(i):
+        async with limite:
+            await mesures.requete(
+                client, "POST", "/login",
+                data={"username": f"agent{i}@bench.rfc", "password": MOT_DE_PASSE}
+            )
+
+    await asyncio.gather(*(connecter(i) for i in range(args.agents)))
+
+
+async def appel_client(client, mesures, contexte, args):
+    async def agent(numero):
+        hasard = random.Random(args.graine + numero)
+        for _ in range(args.iterations):
+            telephone = str(600000000 + hasard.randrange(args.clients))
+            response = await mesures.requete(client, "GET", "/clients/{telephone}", f"/clients/+224{telephone}")
+            await mesures.requete(client, "GET", "/clients/search", params={"q": telephone[:6]})
+            await mesures.requete(client, "POST", "/commande", json={
+                "client_id": response.json()["id"] if response.status_code == 200 else contexte["client_id"],
+                "agence_id": contexte["agence_id"],
+                "createur_id": contexte["user_ids"][0],
+                "recepteur_id": contexte["user_ids"][0],
+                "notes": "Benchmark",
+                "lignes_commandes": [
+                    {"nom_article": f"Article {j}", "reference_article": f"REF-{j}", "quantite": 1, "prix_unitaire": 1500}
+                    for j in range(hasard.randint(1, 5))
+                ]
+            })
+
+    await asyncio.gather(*(agent(i) for i in range(args.utilisateurs)))
+
+
+async def tablettes(client, mesures, contexte, args):
+    agence_id = contexte["agence_id"]
+
+    async def tablette(numero):
+        hasard = random.Random(args.graine + numero)
+        watermark = None
+        for _ in range(args.iterations):
+            await mesures.requete(client, "GET", "/tablettes/verifier/{numero_serie}", f"/tablettes/verifier/BENCH-{numero}")
+            response = await mesures.requete(
+                client, "GET", "/commandes/agence/{agence_id}/changes", f"/commandes/agence/{agence_id}/changes",
+                params={"since": watermark} if watermark else {}
+            )
+            if response.status_code == 200:
+                watermark = response.json()["watermark"]
+            commande_id = hasard.choice(contexte["commande_ids"])
+            await mesures.requete(
+                client, "PATCH", "/commandes/{commande_id}/update_status", f"/commandes/{commande_id}/update_status",
+                params={"status": hasard.choice(STATUTS)}, headers=contexte["entetes"]
+            )
+
+    await asyncio.gather(*(tablette(i) for i in range(args.utilisateurs)))
+
+
+async def back_office(client, mesures, contexte, args):
+    agence_id = contexte["agence_id"]
+    entetes = contexte["entetes"]
+
+    async def poste(numero):
+        for _ in range(args.iterations):
+            await mesures.requete(client, "GET", "/agences", headers=entetes)
+            await mesures.requete(client, "GET", "/utilisateurs", headers=entetes)
+            await mesures.requete(client, "GET", "/tablettes", headers=entetes)
+            await mesures.requete(
+                client, "GET", "/commandes/agence/{agence_id}", f"/commandes/agence/{agence_id}",
+                params={"limit": 100}, headers=entetes
+            )
+            await mesures.requete(client, "GET", "/rapports/agences", params={"agence_id": agence_id}, headers=entetes)
+
+    await asyncio.gather(*(poste(i) for i in range(args.utilisateurs)))
+
+
+SCENARIOS = {
+    "tempete_connexions": tempete_connexions,
+    "appel_client": appel_client,
+    "tablettes": tablettes,
+    "back_office": back_office,
+}
+
+
+async def executer(noms, contexte, args):
+    from main import app, lifespan
+
+    resultats = {}
+    async with lifespan(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for nom in noms:
+                mesures = Mesures()
+                debut = time.perf_counter()
+                await SCENARIOS[nom](client, mesures, contexte, args)
+                duree = time.perf_counter() - debut
+                resultats[nom] = {"duree_s": round(duree, 3), "endpoints": mesures.resultats(duree)}
+    return resultats
+
+
+##===============================================================##
+##                 Identification et comparaison                 ##
+##===============================================================##
+def _commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        modifie = bool(subprocess.run(["git", "status", "--porcelain", "-uno"], capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{sha}-modifie" if modifie else sha
+
+
+def comparer(resultats, reference, seuil, plancher_ms):
+    """p95 de chaque endpoint commun aux deux exécutions ; régression au-delà du seuil."""
+    comparaison = []
+    for scenario, donnees in resultats.items():
+        endpoints_reference = reference.get("scenarios", {}).get(scenario, {}).get("endpoints", {})
+        for endpoint, mesure in donnees["endpoints"].items():
+            avant = endpoints_reference.get(endpoint, {}).get("p95_ms")
+            apres = mesure.get("p95_ms")
+            if avant is None or apres is None:
+                continue
+            comparaison.append({
+                "scenario": scenario,
+                "endpoint": endpoint,
+                "p95_reference_ms": avant,
+                "p95_ms": apres,
+                "variation_pct": round((apres - avant) / avant * 100, 1) if avant else None,
+                "regression": apres > avant * (1 + seuil / 100) and apres - avant > plancher_ms,
+            })
+    return comparaison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Scénarios à exécuter, séparés par des virgules")
+    parser.add_argument("--utilisateurs", type=int, default=20, help="Utilisateurs simulés en parallèle par scénario")
+    parser.add_argument("--iterations", type=int, default=20, help="Itérations par utilisateur simulé")
+    parser.add_argument("--agents", type=int, default=100, help="Agents (tempête de connexions)")
+    parser.add_argument("--clients", type=int, default=10000, help="Clients en base")
+    parser.add_argument("--commandes", type=int, default=1000, help="Commandes existantes de l'agence")
+    parser.add_argument("--graine", type=int, default=42, help="Graine des données et des choix simulés")
+    parser.add_argument("--sortie", help="Fichier JSON du résultat (sinon sortie standard)")
+    parser.add_argument("--reference", help="Résultat d'une exécution précédente à comparer")
+    parser.add_argument("--seuil", type=float, default=20.0, help="Hausse de p95 tolérée, en %%")
+    parser.add_argument("--plancher-ms", type=float, default=1.0, help="Hausse de p95 ignorée en dessous de ce nombre de ms")
+    args = parser.parse_args()
+
+    noms = [nom.strip() for nom in args.scenarios.split(",") if nom.strip()]
+    inconnus = set(noms) - set(SCENARIOS)
+    if inconnus:
+        parser.error(f"Scénario(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+
+    contexte = preparer(args)
+    transport = installer_faux_fcm()
+    resultats = asyncio.run(executer(noms, contexte, args))
+
+    rapport = {
+        "benchmark": "scenarios",
+        "version_format": VERSION_FORMAT,
+        "commit": _commit(),
+        "date": datetime.utcnow().isoformat(timespec="seconds"),
+        "base": engine.dialect.name,
+        "python": platform.python_version(),
+        "parametres": {cle: valeur for cle, valeur in vars(args).items() if cle not in ("sortie", "reference")},
+        "notifications_envoyees": len(transport.envoyees),
+        "scenarios": resultats,
+    }
+    regressions = []
+    if args.reference:
+        with open(args.reference, encoding="utf-8") as fichier:
+            reference = json.load(fichier)
+        rapport["reference"] = reference.get("commit")
+        # Percentiles comparables seulement à paramètres identiques
+        differents = sorted(
+            cle for cle in ("scenarios", "utilisateurs", "iterations", "agents", "clients", "commandes", "graine")
+            if reference.get("parametres", {}).get(cle) != rapport["parametres"][cle]
+        )
+        if reference.get("base") != rapport["base"]:
+            differents.append("base")
+        if differents:
+            rapport["parametres_differents"] = differents
+            print(f"Attention : paramètres différents de la référence ({', '.join(differents)})", file=sys.stderr)
+        rapport["comparaison"] = comparer(resultats, reference, args.seuil, args.plancher_ms)
+        regressions = [ligne for ligne in rapport["comparaison"] if ligne["regression"]]
+
+    sortie = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as fichier:
+            fichier.write(sortie + "\n")
+    else:
+        print(sortie)
+
+    for ligne in regressions:
+        print(
+            f"Régression {ligne['scenario']} {ligne['endpoint']} : p95 {ligne['p95_reference_ms']} -> {ligne['p95_ms']} ms",
+            file=sys.stderr
+        )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import threading
+from typing import Any, Dict, Hashable, Optional
+
+from cachetools import TTLCache
+
+# Registre des caches du processus, exposé par l'endpoint /metrics
+caches: Dict[str, "CacheLocal"] = {}
+
+
+class CacheLocal:
+    """
+    Cache en mémoire du processus, borné en taille (LRU) et en durée (TTL).
+    Thread-safe : utilisable depuis les endpoints sync (threadpool) et async.
+    """
+
+    def __init__(self, nom: str, taille_max: int = 1024, ttl: float = 60.0):
+        self.nom = nom
+        self._cache = TTLCache(maxsize=taille_max, ttl=ttl)
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        caches[nom] = self
+
+    def get(self, cle: Hashable) -> Optional[Any]:
+        with self._verrou:
+            valeur = self._cache.get(cle)
+            if valeur is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return valeur
+
+    def set(self, cle: Hashable, valeur: Any) -> None:
+        with self._verrou:
+            self._cache[cle] = valeur
+
+    def invalider(self, cle: Hashable) -> None:
+        with self._verrou:
+            self._cache.pop(cle, None)
+
+    def vider(self) -> None:
+        with self._verrou:
+            self._cache.clear()
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                "entrees": len(self._cache),
+                "taille_max": self._cache.maxsize,
+                "ttl_secondes": self._cache.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "taux_hit": round(self.hits / total, 3) if total else None,
+            }
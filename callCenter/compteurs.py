@@ -0,0 +1,146 @@
+import asyncio
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import bindparam, exists, func, update
+from sqlalchemy.orm import Session
+
+from cache import CacheLocal
+from database import SessionLocal
+from logger import logger
+from models import User, UserSession
+
+# Compteurs de UserSession incrémentables par les endpoints /sessions
+COLONNES_COMPTEURS = ("nombre_commande_creer", "nombre_commande_traiter")
+
+
+def incrementer_compteur(db: Session, session_id: int, colonne: str, role: str, increment: int = 1) -> Optional[int]:
+    """
+    Incrémente atomiquement un compteur de session, en une seule requête
+    UPDATE ... SET n = coalesce(n, 0) + 1 ... RETURNING n, et valide.
+    La vérification du rôle du propriétaire de la session fait partie du WHERE.
+
+    Returns:
+        La nouvelle valeur, ou None si la session n'existe pas ou si son
+        propriétaire n'a pas le rôle attendu
+    """
+    compteur = getattr(UserSession, colonne)
+    valeur = db.execute(
+        update(UserSession)
+        .where(
+            UserSession.id == session_id,
+            exists().where(User.id == UserSession.user_id, User.role == role)
+        )
+        .values({colonne: func.coalesce(compteur, 0) + increment})
+        .returning(compteur)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    db.commit()
+    return valeur
+
+
+class CompteursSessions:
+    """
+    Accumulation en mémoire des incréments de compteurs de session.
+
+    Lorsque `actif` est vrai, seul le premier incrément d'une session passe par
+    `incrementer_compteur` (qui vérifie la session et le rôle) ; les suivants
+    sont cumulés en mémoire et écrits par lot toutes les `intervalle` secondes
+    en un seul UPDATE executemany, puis une dernière fois à l'arrêt.
+    Les compteurs en base peuvent donc être en retard de `intervalle` secondes.
+    """
+
+    def __init__(self, actif: bool = False, intervalle: float = 5.0, fabrique_session=None):
+        self.actif = actif
+        self.intervalle = intervalle
+        self._fabrique_session = fabrique_session or SessionLocal
+        self._en_attente: Dict[int, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COLONNES_COMPTEURS, 0))
+        self._verrou = threading.Lock()
+        # Sessions déjà vérifiées (existence et rôle), par (session_id, rôle)
+        self._autorisees = CacheLocal("sessions_compteurs", taille_max=4096, ttl=3600)
+        self._tache: Optional[asyncio.Task] = None
+        self._compteurs = {"increments_cumules": 0, "ecritures": 0, "echecs": 0}
+
+    def autorisee(self, session_id: int, role: str) -> bool:
+        return self._autorisees.get((session_id, role)) is not None
+
+    def autoriser(self, session_id: int, role: str) -> None:
+        self._autorisees.set((session_id, role), True)
+
+    def ajouter(self, session_id: int, colonne: str, increment: int = 1) -> None:
+        with self._verrou:
+            self._en_attente[session_id][colonne] += increment
+            self._compteurs["increments_cumules"] += increment
+
+    def vider(self) -> int:
+        """Écrit les incréments cumulés (appel bloquant). Retourne le nombre de sessions mises à jour."""
+        with self._verrou:
+            lot, self._en_attente = self._en_attente, defaultdict(lambda: dict.fromkeys(COLONNES_COMPTEURS, 0))
+        if not lot:
+            return 0
+        table = UserSession.__table__
+        requete = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values({
+                colonne: func.coalesce(table.c[colonne], 0) + bindparam(f"b_{colonne}")
+                for colonne in COLONNES_COMPTEURS
+            })
+        )
+        parametres = [
+            {"b_id": session_id, **{f"b_{colonne}": n for colonne, n in increments.items()}}
+            for session_id, increments in lot.items()
+        ]
+        db = self._fabrique_session()
+        try:
+            db.execute(requete, parametres)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # Remettre les incréments en attente pour la prochaine écriture
+            with self._verrou:
+                for session_id, increments in lot.items():
+                    for colonne, n in increments.items():
+                        self._en_attente[session_id][colonne] += n
+            self._compteurs["echecs"] += 1
+            logger.error(f"Échec de l'écriture des compteurs de {len(lot)} session(s): {str(e)}")
+            return 0
+        finally:
+            db.close()
+        self._compteurs["ecritures"] += 1
+        return len(lot)
+
+    async def _boucle(self):
+        while True:
+            await asyncio.sleep(self.intervalle)
+            await asyncio.to_thread(self.vider)
+
+    async def demarrer(self):
+        """Démarre l'écriture périodique (mode cumulé uniquement)."""
+        if self.actif and self._tache is None:
+            self._tache = asyncio.create_task(self._boucle(), name="compteurs-sessions")
+
+    async def arreter(self):
+        """Arrête l'écriture périodique et écrit les derniers incréments."""
+        if self._tache is not None:
+            self._tache.cancel()
+            await asyncio.gather(self._tache, return_exceptions=True)
+            self._tache = None
+        await asyncio.to_thread(self.vider)
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            return {
+                **self._compteurs,
+                "actif": self.actif,
+                "sessions_en_attente": len(self._en_attente),
+            }
+
+
+# Instance singleton, désactivée par défaut (incrément atomique à chaque appel)
+compteurs_sessions = CompteursSessions(
+    actif=os.getenv("SESSION_COUNTERS_BUFFERED", "false").lower() in ("1", "true", "yes", "oui"),
+    intervalle=float(os.getenv("SESSION_COUNTERS_FLUSH_SECONDS", "5"))
+)
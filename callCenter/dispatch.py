@@ -0,0 +1,77 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+
+class EchecEnvoiNotification(Exception):
+    """Levée par un transport lorsque l'envoi d'une notification a échoué."""
+
+
+@dataclass
+class Notification:
+    """Notification à envoyer aux tablettes d'une agence."""
+    agence_id: int
+    titre: str
+    corps: str
+    donnees: Dict[str, str] = field(default_factory=dict)
+    tentatives: int = 0
+
+
+class FirebaseTransport:
+    """
+    Transport réel : délègue l'envoi à FirebaseNotificationService.
+
+    Utilisé par le relais de l'outbox (callCenter/outbox.py), seul chemin
+    d'envoi des notifications de commande.
+    """
+
+    def __init__(self, service=None):
+        self._service = service
+
+    @property
+    def service(self):
+        if self._service is None:
+            from .firebase_service import firebase_service
+            self._service = firebase_service
+        return self._service
+
+    async def envoyer_lot(self, notifications: List[Notification]) -> List[Dict[str, Any]]:
+        """Envoie un lot via messaging.send_each ; un résultat par notification."""
+        # Les appels HTTPS vers FCM sont bloquants : ils sont exécutés hors de la boucle
+        return await asyncio.to_thread(
+            self.service.send_notifications_batch,
+            [
+                {
+                    "agency_id": notification.agence_id,
+                    "title": notification.titre,
+                    "body": notification.corps,
+                    "data": notification.donnees
+                }
+                for notification in notifications
+            ]
+        )
+
+
+class FakeFCMTransport:
+    """Transport en mémoire remplaçant FCM dans les tests et les benchmarks."""
+
+    def __init__(self, echecs: int = 0, latence: float = 0.0):
+        self.envoyees = []
+        self.lots = []
+        self.echecs_restants = echecs
+        self.latence = latence
+
+    async def envoyer_lot(self, notifications: List[Notification]) -> List[Dict[str, Any]]:
+        # Un seul aller-retour par lot ; les échecs simulés touchent les premiers messages
+        if self.latence:
+            await asyncio.sleep(self.latence)
+        self.lots.append(len(notifications))
+        resultats = []
+        for notification in notifications:
+            if self.echecs_restants > 0:
+                self.echecs_restants -= 1
+                resultats.append({"success": False, "error": "Échec simulé"})
+            else:
+                self.envoyees.append(notification)
+                resultats.append({"success": True, "message_id": f"fake-{len(self.envoyees)}"})
+        return resultats
@@ -0,0 +1,67 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from cache import CacheLocal
+
+
+@dataclass(frozen=True)
+class ReponseEnCache:
+    """Corps JSON déjà sérialisé et son ETag fort."""
+    contenu: bytes
+    etag: str
+
+
+class CacheReponses:
+    """
+    Réponses pré-sérialisées d'un endpoint de données de référence, par
+    paramètres de requête. L'ETag est l'empreinte du corps : deux workers
+    servant les mêmes données donnent le même ETag.
+
+    Invalidé en entier par les endpoints qui modifient ces données ; le TTL
+    borne le retard d'un worker sur les écritures faites par un autre.
+    """
+
+    def __init__(self, nom: str, taille_max: int = 256, ttl: float = 60.0):
+        self._cache = CacheLocal(nom, taille_max=taille_max, ttl=ttl)
+
+    def get(self, cle: Hashable) -> Optional[ReponseEnCache]:
+        return self._cache.get(cle)
+
+    def enregistrer(self, cle: Hashable, modele: BaseModel) -> ReponseEnCache:
+        contenu = modele.model_dump_json().encode()
+        entree = ReponseEnCache(contenu=contenu, etag=f'"{hashlib.sha256(contenu).hexdigest()[:32]}"')
+        self._cache.set(cle, entree)
+        return entree
+
+    def invalider(self) -> None:
+        self._cache.vider()
+
+
+def _etag_correspond(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    valeurs = [valeur.strip() for valeur in if_none_match.split(",")]
+    # Comparaison faible (RFC 9110) : W/"x" correspond à "x"
+    return "*" in valeurs or etag in (valeur.removeprefix("W/") for valeur in valeurs)
+
+
+def reponse_conditionnelle(request: Request, entree: ReponseEnCache) -> Response:
+    """304 sans corps si le client a déjà cette version, sinon les octets en cache."""
+    entetes = {"ETag": entree.etag, "Cache-Control": "no-cache"}
+    if _etag_correspond(request.headers.get("if-none-match"), entree.etag):
+        return Response(status_code=304, headers=entetes)
+    return Response(content=entree.contenu, media_type="application/json", headers=entetes)
+
+
+_TAILLE = int(os.getenv("REFERENCE_CACHE_SIZE", "256"))
+_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "60"))
+
+# Caches des listes de référence du back office
+agences_reponses = CacheReponses("reponses_agences", _TAILLE, _TTL)
+tablettes_reponses = CacheReponses("reponses_tablettes", _TAILLE, _TTL)
+utilisateurs_reponses = CacheReponses("reponses_utilisateurs", _TAILLE, _TTL)
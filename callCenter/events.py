@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from logger import logger
+
+
+def _json_default(valeur):
+    # Dates au format ISO 8601, comme dans les réponses de l'API
+    if hasattr(valeur, "isoformat"):
+        return valeur.isoformat()
+    return str(valeur)
+
+
+@dataclass
+class EvenementCommande:
+    """Événement compact poussé aux tablettes d'une agence."""
+    id: int
+    agence_id: int
+    type: str
+    donnees: Dict[str, Any]
+
+    def trame_sse(self) -> str:
+        """Représentation au format Server-Sent Events."""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.donnees, default=_json_default)}\n\n"
+
+
+@dataclass(eq=False)
+class Abonnement:
+    """File d'un flux SSE ouvert sur une agence."""
+    agence_id: int
+    file: asyncio.Queue
+    deborde: bool = False
+
+
+@dataclass
+class _HistoriqueAgence:
+    evenements: deque
+    # Identifiant du dernier événement sorti de l'historique : un client qui
+    # reprend avant cet identifiant a perdu des événements
+    dernier_evince: int = 0
+    abonnes: Set[Abonnement] = field(default_factory=set)
+
+
+class OrderEventHub:
+    """
+    Diffusion en mémoire des événements de commandes, par agence.
+
+    Chaque flux SSE s'abonne à son agence ; `publier` dépose l'événement dans
+    la file de chaque abonné. Un historique borné par agence permet la reprise
+    via Last-Event-ID. Les identifiants partent de l'horodatage de démarrage
+    (en ms) et restent donc croissants d'un redémarrage à l'autre.
+
+    Le hub est propre au processus : avec plusieurs workers, un abonné ne
+    reçoit que les événements publiés par son worker.
+    À utiliser depuis la boucle d'événements (endpoints async).
+    """
+
+    def __init__(self, taille_historique: int = 200, taille_file: int = 100):
+        self.taille_historique = taille_historique
+        self.taille_file = taille_file
+        self._debut = int(time.time() * 1000)
+        self._sequence = itertools.count(self._debut + 1)
+        self._agences: Dict[int, _HistoriqueAgence] = {}
+        self._compteurs = {"publies": 0, "abonnements": 0, "debordements": 0}
+
+    def _agence(self, agence_id: int) -> _HistoriqueAgence:
+        agence = self._agences.get(agence_id)
+        if agence is None:
+            agence = _HistoriqueAgence(
+                evenements=deque(maxlen=self.taille_historique),
+                dernier_evince=self._debut
+            )
+            self._agences[agence_id] = agence
+        return agence
+
+    def publier(self, agence_id: int, type: str, donnees: Dict[str, Any]) -> EvenementCommande:
+        """Enregistre l'événement et le pousse à tous les flux ouverts sur l'agence."""
+        agence = self._agence(agence_id)
+        evenement = EvenementCommande(id=next(self._sequence), agence_id=agence_id, type=type, donnees=donnees)
+        if len(agence.evenements) == agence.evenements.maxlen:
+            agence.dernier_evince = agence.evenements[0].id
+        agence.evenements.append(evenement)
+        self._compteurs["publies"] += 1
+
+        for abonnement in list(agence.abonnes):
+            try:
+                abonnement.file.put_nowait(evenement)
+            except asyncio.QueueFull:
+                # Client trop lent : on ferme son flux, il reprendra via Last-Event-ID
+                abonnement.deborde = True
+                agence.abonnes.discard(abonnement)
+                self._compteurs["debordements"] += 1
+                logger.warning(f"Flux SSE de l'agence {agence_id} fermé : file pleine")
+        return evenement
+
+    def abonner(self, agence_id: int, dernier_id: Optional[int] = None) -> Tuple[Abonnement, List[EvenementCommande], bool]:
+        """
+        Ouvre un abonnement sur une agence.
+
+        Returns:
+            L'abonnement, les événements manqués depuis `dernier_id` et un
+            booléen indiquant que la reprise est impossible (resynchronisation)
+        """
+        agence = self._agence(agence_id)
+        abonnement = Abonnement(agence_id=agence_id, file=asyncio.Queue(maxsize=self.taille_file))
+        agence.abonnes.add(abonnement)
+        self._compteurs["abonnements"] += 1
+
+        if dernier_id is None:
+            return abonnement, [], False
+        if dernier_id < agence.dernier_evince:
+            return abonnement, [], True
+        return abonnement, [e for e in agence.evenements if e.id > dernier_id], False
+
+    def desabonner(self, abonnement: Abonnement):
+        agence = self._agences.get(abonnement.agence_id)
+        if agence:
+            agence.abonnes.discard(abonnement)
+
+    def fermer(self):
+        """Termine tous les flux ouverts (arrêt de l'application)."""
+        for agence in self._agences.values():
+            for abonnement in agence.abonnes:
+                try:
+                    abonnement.file.put_nowait(None)
+                except asyncio.QueueFull:
+                    pass
+            agence.abonnes.clear()
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            **self._compteurs,
+            "flux_ouverts": sum(len(agence.abonnes) for agence in self._agences.values()),
+            "agences": len(self._agences),
+        }
+
+
+# Intervalle des trames de maintien de connexion
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+# Instance singleton du hub
+order_events = OrderEventHub(
+    taille_historique=int(os.getenv("SSE_HISTORY_SIZE", "200")),
+    taille_file=int(os.getenv("SSE_QUEUE_SIZE", "100"))
+)
+
+
+async def flux_sse(request, agence_id: int, dernier_id: Optional[int], hub: OrderEventHub = None,
+                   heartbeat: float = None):
+    """Générateur des trames SSE d'une agence : rattrapage, événements et heartbeats."""
+    hub = hub or order_events
+    heartbeat = heartbeat or SSE_HEARTBEAT_SECONDS
+    abonnement, rattrapage, resynchroniser = hub.abonner(agence_id, dernier_id)
+    try:
+        yield "retry: 3000\n\n"
+        if resynchroniser:
+            # Événements perdus : la tablette doit recharger la liste complète
+            yield f"event: resync\ndata: {json.dumps({'agence_id': agence_id})}\n\n"
+        for evenement in rattrapage:
+            yield evenement.trame_sse()
+
+        while True:
+            try:
+                evenement = await asyncio.wait_for(abonnement.file.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": heartbeat\n\n"
+                continue
+            if evenement is None:
+                break
+            yield evenement.trame_sse()
+            if abonnement.deborde and abonnement.file.empty():
+                break
+    finally:
+        hub.desabonner(abonnement)
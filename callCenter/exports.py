@@ -0,0 +1,104 @@
+import csv
+import io
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional
+
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+
+from database import AsyncSessionLocal
+from logger import logger
+from models import Commande
+
+# Commandes lues (et envoyées) par lot : la mémoire utilisée dépend du lot,
+# pas du nombre de commandes exportées
+TAILLE_LOT_EXPORT = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+FORMATS_EXPORT = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Une ligne CSV par ligne de commande, précédée des colonnes de la commande
+COLONNES_COMMANDE = [
+    "id", "client_id", "client_nom", "client_telephone", "client_adresse", "agence_id",
+    "createur_id", "recepteur_id", "date_creation", "date_reception", "statut", "montant_total", "notes",
+]
+COLONNES_LIGNE = ["id", "nom_article", "reference_article", "quantite", "prix_unitaire", "sous_total"]
+
+
+def requete_export(agence_id: Optional[int] = None, date_debut: Optional[datetime] = None,
+                   date_fin: Optional[datetime] = None):
+    query = select(Commande).options(
+        joinedload(Commande.client),
+        selectinload(Commande.lignecommande)
+    )
+    if agence_id is not None:
+        query = query.where(Commande.agence_id == agence_id)
+    if date_debut is not None:
+        query = query.where(Commande.date_creation >= date_debut)
+    if date_fin is not None:
+        query = query.where(Commande.date_creation <= date_fin)
+    # yield_per : curseur côté serveur (PostgreSQL) et lecture par lots
+    return query.order_by(Commande.date_creation, Commande.id).execution_options(yield_per=TAILLE_LOT_EXPORT)
+
+
+def _lot_ndjson(commandes: list) -> bytes:
+    return b"".join(orjson.dumps(commande) + b"\n" for commande in commandes)
+
+
+def _valeur_csv(valeur):
+    return valeur.isoformat() if isinstance(valeur, datetime) else valeur
+
+
+def _lot_csv(commandes: list, entete: bool) -> bytes:
+    tampon = io.StringIO()
+    writer = csv.writer(tampon)
+    if entete:
+        writer.writerow(COLONNES_COMMANDE + [f"ligne_{colonne}" for colonne in COLONNES_LIGNE])
+    for commande in commandes:
+        valeurs = [_valeur_csv(commande[colonne]) for colonne in COLONNES_COMMANDE]
+        # Une commande sans ligne reste exportée, colonnes de ligne vides
+        for ligne in commande["lignes_commande"] or [dict.fromkeys(COLONNES_LIGNE, "")]:
+            writer.writerow(valeurs + [ligne[colonne] for colonne in COLONNES_LIGNE])
+    return tampon.getvalue().encode()
+
+
+async def flux_export(
+    format: str,
+    serialiser: Callable[[Commande], dict],
+    agence_id: Optional[int] = None,
+    date_debut: Optional[datetime] = None,
+    date_fin: Optional[datetime] = None,
+    fabrique_session=None
+) -> AsyncIterator[bytes]:
+    """
+    Générateur des octets de l'export, un morceau par lot de commandes.
+
+    La session est ouverte ici et non via Depends(get_async_db) : les
+    dépendances sont fermées avant que le corps d'une StreamingResponse soit
+    envoyé.
+    """
+    fabrique_session = fabrique_session or AsyncSessionLocal
+    nombre = 0
+    async with fabrique_session() as db:
+        try:
+            result = await db.stream(requete_export(agence_id, date_debut, date_fin))
+            async for lot in result.scalars().partitions():
+                commandes = [serialiser(commande) for commande in lot]
+                if format == "csv":
+                    yield _lot_csv(commandes, entete=nombre == 0)
+                else:
+                    yield _lot_ndjson(commandes)
+                # Les commandes du lot ne sont plus référencées : la session
+                # (identity map faible) les libère avant le lot suivant
+                nombre += len(commandes)
+            if format == "csv" and nombre == 0:
+                yield _lot_csv([], entete=True)
+        except Exception:
+            # Les en-têtes sont déjà partis : la réponse est tronquée
+            logger.exception(f"Export des commandes interrompu après {nombre} commande(s)")
+            raise
+    logger.info(f"Export {format} terminé : {nombre} commande(s)")
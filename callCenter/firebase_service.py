@@ -1,23 +1,34 @@
 import firebase_admin
 from firebase_admin import credentials, messaging
 import os
-import logging
+import threading
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from models import Tablette
+from logger import logger
 
-logger = logging.getLogger(__name__)
+# Nombre maximal de messages par appel send_each (limite imposée par FCM)
+FCM_BATCH_SIZE = min(int(os.getenv("FCM_BATCH_SIZE", "500")), 500)
+# Nombre maximal de tokens par appel subscribe_to_topic (limite imposée par FCM)
+FCM_TOPIC_BATCH_SIZE = 1000
 
 class FirebaseNotificationService:
     """Service pour gérer les notifications via Firebase Cloud Messaging."""
     
     _initialized = False
+    _lock = threading.Lock()
     
-    def __init__(self):
-        """Initialiser le service Firebase."""
-        if not self._initialized:
-            self._initialize_firebase()
-            FirebaseNotificationService._initialized = True
+    def _ensure_initialized(self):
+        """
+        Initialise le SDK Firebase au premier appel FCM, et non à l'import :
+        le chargement des credentials ne ralentit pas le démarrage des workers.
+        """
+        if FirebaseNotificationService._initialized:
+            return
+        with FirebaseNotificationService._lock:
+            if not FirebaseNotificationService._initialized:
+                self._initialize_firebase()
+                FirebaseNotificationService._initialized = True
     
     def _initialize_firebase(self):
         """Initialise la connexion Firebase."""
@@ -66,6 +77,7 @@ class FirebaseNotificationService:
             Résultat de l'opération
         """
         try:
+            self._ensure_initialized()
             topic = f"agency_{agency_id}"
             
             # Exécute l'opération appropriée
@@ -109,6 +121,41 @@ class FirebaseNotificationService:
             db.commit()
             logger.info(f"{log_msg} Firebase token for device {device_id}")
     
+    def _build_agency_message(
+        self,
+        agency_id: int,
+        title: str,
+        body: str,
+        data: Optional[Dict[str, str]] = None
+    ) -> messaging.Message:
+        """Construit le message FCM destiné au topic d'une agence."""
+        return messaging.Message(
+            notification=messaging.Notification(
+                title=title,
+                body=body,
+            ),
+            data=data or {},
+            topic=f"agency_{agency_id}",
+            android=messaging.AndroidConfig(
+                priority="high",
+                notification=messaging.AndroidNotification(
+                    icon="ic_notification",
+                    color="#f5a623",
+                    channel_id="rfc_orders",
+                    click_action="OPEN_ORDER_ACTIVITY"
+                )
+            ),
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(
+                    aps=messaging.Aps(
+                        sound="default",
+                        badge=1,
+                        content_available=True
+                    )
+                )
+            )
+        )
+
     def send_notification_to_agency(
         self, 
         agency_id: int, 
@@ -121,33 +168,8 @@ class FirebaseNotificationService:
         Envoyer une notification à tous les appareils d'une agence spécifique.
         """
         try:
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=body,
-                ),
-                data=data or {},
-                topic=f"agency_{agency_id}",
-                android=messaging.AndroidConfig(
-                    priority="high",
-                    notification=messaging.AndroidNotification(
-                        icon="ic_notification",
-                        color="#f5a623",
-                        channel_id="rfc_orders",
-                        click_action="OPEN_ORDER_ACTIVITY"
-                    )
-                ),
-                apns=messaging.APNSConfig(
-                    payload=messaging.APNSPayload(
-                        aps=messaging.Aps(
-                            sound="default",
-                            badge=1,
-                            content_available=True
-                        )
-                    )
-                )
-            )
-            
+            self._ensure_initialized()
+            message = self._build_agency_message(agency_id, title, body, data)
             response = messaging.send(message)
             logger.info(f"Successfully sent notification to agency {agency_id}: {response}")
             return {"success": True, "message_id": response}
@@ -156,6 +178,85 @@ class FirebaseNotificationService:
             logger.error(f"Error sending notification to agency {agency_id}: {str(e)}")
             return {"success": False, "error": str(e)}
     
+    def send_notifications_batch(self, notifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envoyer plusieurs notifications d'agence via messaging.send_each, par
+        paquets de FCM_BATCH_SIZE messages (500 au plus, limite de FCM).
+
+        Args:
+            notifications: dicts avec les clés agency_id, title, body et data
+
+        Returns:
+            Un résultat par notification, dans l'ordre reçu
+        """
+        results = []
+        for start in range(0, len(notifications), FCM_BATCH_SIZE):
+            chunk = notifications[start:start + FCM_BATCH_SIZE]
+            try:
+                self._ensure_initialized()
+                messages = [self._build_agency_message(**notification) for notification in chunk]
+                batch = messaging.send_each(messages)
+            except Exception as e:
+                # Échec du paquet entier (réseau, authentification...)
+                logger.error(f"Error sending batch of {len(chunk)} notifications: {str(e)}")
+                results.extend({"success": False, "error": str(e)} for _ in chunk)
+                continue
+            for response in batch.responses:
+                if response.success:
+                    results.append({"success": True, "message_id": response.message_id})
+                else:
+                    results.append({"success": False, "error": str(response.exception)})
+            logger.info(
+                f"Sent batch of {len(chunk)} notifications: "
+                f"{batch.success_count} successful, {batch.failure_count} failed"
+            )
+        return results
+
+    def subscribe_tokens_to_topic(self, tokens: List[str], topic: str) -> Dict[str, Any]:
+        """
+        Souscrire des tokens à un topic par paquets de 1000 (un appel par paquet).
+
+        Returns:
+            Compteurs et liste des (token, raison) refusés par FCM
+        """
+        success_count = 0
+        errors = []
+        for start in range(0, len(tokens), FCM_TOPIC_BATCH_SIZE):
+            chunk = tokens[start:start + FCM_TOPIC_BATCH_SIZE]
+            try:
+                self._ensure_initialized()
+                response = messaging.subscribe_to_topic(chunk, topic)
+            except Exception as e:
+                logger.error(f"Error subscribing {len(chunk)} tokens to {topic}: {str(e)}")
+                errors.extend((token, str(e)) for token in chunk)
+                continue
+            success_count += response.success_count
+            errors.extend((chunk[error.index], error.reason) for error in response.errors)
+        logger.info(f"Subscribed tokens to {topic}: {success_count} successful, {len(errors)} failed")
+        return {"success_count": success_count, "failure_count": len(errors), "errors": errors}
+
+    def find_unregistered_tokens(self, tokens: List[str]) -> List[str]:
+        """
+        Tokens que FCM déclare non enregistrés (application désinstallée, token
+        expiré), détectés par un envoi dry_run : aucun message n'est délivré.
+        """
+        unregistered = []
+        for start in range(0, len(tokens), FCM_BATCH_SIZE):
+            chunk = tokens[start:start + FCM_BATCH_SIZE]
+            try:
+                self._ensure_initialized()
+                batch = messaging.send_each([messaging.Message(token=token) for token in chunk], dry_run=True)
+            except Exception as e:
+                # Statut inconnu : ces tokens sont conservés
+                logger.error(f"Error checking {len(chunk)} tokens: {str(e)}")
+                continue
+            unregistered.extend(
+                token for token, response in zip(chunk, batch.responses)
+                if isinstance(response.exception, messaging.UnregisteredError)
+            )
+        logger.info(f"Checked {len(tokens)} tokens: {len(unregistered)} unregistered")
+        return unregistered
+
     def register_device_token(
         self, 
         token: str, 
@@ -176,5 +277,5 @@ class FirebaseNotificationService:
         """Désinscrit un token d'appareil du topic de son agence."""
         return self._handle_device_token_operation('unsubscribe', token, agency_id, device_id, db)
 
-# Instance singleton du service
+# Instance singleton du service (Firebase est initialisé au premier envoi)
 firebase_service = FirebaseNotificationService()
\ No newline at end of file
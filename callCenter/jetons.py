@@ -0,0 +1,175 @@
+"""
+Maintenance des tokens FCM des tablettes.
+
+Resouscription en masse de chaque tablette active au topic de son agence,
+et purge des tokens que FCM déclare non enregistrés :
+
+    python -m callCenter.jetons resubscribe [--agence ID]
+    python -m callCenter.jetons prune
+
+Ces commandes, planifiées une fois par jour (cron), sont le chemin normal.
+La maintenance peut aussi tourner périodiquement dans l'API, sur un seul
+worker : TOKEN_MAINTENANCE_ENABLED=true sur ce worker uniquement (sinon chaque
+worker appellerait FCM et purgerait les mêmes tokens en parallèle), toutes
+les TOKEN_MAINTENANCE_INTERVAL_SECONDS secondes.
+"""
+import argparse
+import asyncio
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from logger import logger
+from models import Tablette
+
+
+def _service_firebase(service=None):
+    if service is None:
+        from .firebase_service import firebase_service
+        service = firebase_service
+    return service
+
+
+def tokens_par_topic(db: Session, agence_id: Optional[int] = None) -> Dict[str, List[str]]:
+    """Tokens des tablettes actives, groupés par topic d'agence."""
+    query = select(Tablette.agence_id, Tablette.firebase_token).where(
+        Tablette.est_active.is_(True),
+        Tablette.firebase_token.isnot(None)
+    )
+    if agence_id is not None:
+        query = query.where(Tablette.agence_id == agence_id)
+    topics = defaultdict(list)
+    for agence, token in db.execute(query):
+        topics[f"agency_{agence}"].append(token)
+    return dict(topics)
+
+
+def resouscrire(db: Session, agence_id: Optional[int] = None, service=None) -> Dict[str, Any]:
+    """
+    Resouscrit les tokens de toutes les tablettes actives au topic de leur
+    agence, par paquets de 1000 tokens par appel FCM.
+    """
+    service = _service_firebase(service)
+    resultat = {"topics": 0, "tokens": 0, "succes": 0, "echecs": 0, "raisons": defaultdict(int)}
+    for topic, tokens in tokens_par_topic(db, agence_id).items():
+        reponse = service.subscribe_tokens_to_topic(tokens, topic)
+        resultat["topics"] += 1
+        resultat["tokens"] += len(tokens)
+        resultat["succes"] += reponse["success_count"]
+        resultat["echecs"] += reponse["failure_count"]
+        for _, raison in reponse["errors"]:
+            resultat["raisons"][raison] += 1
+    resultat["raisons"] = dict(resultat["raisons"])
+    logger.info(f"Resouscription des tablettes : {resultat}")
+    return resultat
+
+
+def purger(db: Session, service=None) -> int:
+    """
+    Efface les tokens que FCM déclare non enregistrés. Retourne le nombre de
+    tablettes dont le token a été effacé.
+    """
+    service = _service_firebase(service)
+    tokens = list(db.scalars(select(Tablette.firebase_token).where(Tablette.firebase_token.isnot(None)).distinct()))
+    morts = service.find_unregistered_tokens(tokens) if tokens else []
+    if not morts:
+        return 0
+    # Un seul UPDATE ; la condition sur le token ne touche pas une tablette
+    # qui vient d'enregistrer un nouveau token
+    result = db.execute(
+        update(Tablette)
+        .where(Tablette.firebase_token.in_(morts))
+        .values(firebase_token=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    logger.info(f"{result.rowcount} token(s) FCM non enregistré(s) effacé(s)")
+    return result.rowcount
+
+
+class MaintenanceJetons:
+    """
+    Resouscription puis purge des tokens, toutes les `intervalle` secondes.
+
+    Inactive par défaut (`actif`) : à n'activer que sur un seul worker.
+    """
+
+    def __init__(self, actif: bool = False, intervalle: float = 86400.0, fabrique_session=None):
+        self.actif = actif
+        self.intervalle = intervalle
+        self._fabrique_session = fabrique_session
+        self._tache: Optional[asyncio.Task] = None
+        self._dernier_resultat: Dict[str, Any] = {}
+
+    def executer(self) -> Dict[str, Any]:
+        """Un passage complet (bloquant : appels FCM et base synchrones)."""
+        if self._fabrique_session is None:
+            from database import SessionLocal
+            self._fabrique_session = SessionLocal
+        db = self._fabrique_session()
+        try:
+            # Purger d'abord : les tokens morts ne sont pas resouscrits
+            purges = purger(db)
+            resultat = {"purges": purges, **resouscrire(db)}
+        finally:
+            db.close()
+        self._dernier_resultat = resultat
+        return resultat
+
+    async def _boucle(self):
+        while True:
+            await asyncio.sleep(self.intervalle)
+            try:
+                await asyncio.to_thread(self.executer)
+            except Exception as e:
+                logger.error(f"Échec de la maintenance des tokens FCM: {str(e)}")
+
+    async def demarrer(self):
+        """Démarre la maintenance périodique sur la boucle courante, si elle est activée."""
+        if self._tache is None and self.actif and self.intervalle > 0:
+            self._tache = asyncio.create_task(self._boucle(), name="maintenance-jetons")
+
+    async def arreter(self):
+        if self._tache is not None:
+            self._tache.cancel()
+            await asyncio.gather(self._tache, return_exceptions=True)
+            self._tache = None
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {"actif": self.actif, "intervalle_secondes": self.intervalle, "dernier_passage": self._dernier_resultat}
+
+
+# Instance singleton de la maintenance périodique
+maintenance_jetons = MaintenanceJetons(
+    actif=os.getenv("TOKEN_MAINTENANCE_ENABLED", "false").lower() in ("1", "true", "yes", "oui"),
+    intervalle=float(os.getenv("TOKEN_MAINTENANCE_INTERVAL_SECONDS", "86400"))
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m callCenter.jetons", description=__doc__.strip().splitlines()[0])
+    commandes = parser.add_subparsers(dest="commande", required=True)
+    resubscribe = commandes.add_parser("resubscribe", help="Resouscrire les tablettes actives au topic de leur agence")
+    resubscribe.add_argument("--agence", type=int, default=None, help="Limiter à une agence")
+    commandes.add_parser("prune", help="Effacer les tokens que FCM déclare non enregistrés")
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        if args.commande == "resubscribe":
+            resultat = resouscrire(db, args.agence)
+            print(f"{resultat['succes']}/{resultat['tokens']} token(s) souscrit(s) sur {resultat['topics']} topic(s)")
+            for raison, nombre in resultat["raisons"].items():
+                print(f"  {raison}: {nombre}")
+        else:
+            print(f"{purger(db)} token(s) effacé(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,11 @@
 from .firebase_service import firebase_service
 from typing import Dict, Any
 import asyncio
-import logging
 from sqlalchemy.orm import Session
 from database import get_db
+from logger import logger
 from models import Tablette
 
-logger = logging.getLogger(__name__)
-
 class NotificationService:
     """Service pour gérer les notifications aux tablettes des restaurants."""
     
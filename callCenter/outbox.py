@@ -0,0 +1,290 @@
+"""
+Outbox des notifications (table notification_outbox).
+
+Les endpoints écrivent la notification dans la même transaction que la
+commande (`ajouter`) : une notification existe si et seulement si la
+modification de la commande est validée. Le relais lit ensuite les lignes en
+attente par lot, les envoie à FCM et les marque envoyées.
+
+Les lots sont réservés par SELECT ... FOR UPDATE SKIP LOCKED : plusieurs
+workers de l'API relaient en parallèle sans jamais prendre la même ligne.
+
+Les notifications d'une même commande partent dans leur ordre d'écriture :
+une ligne n'est relayée que lorsque toutes les lignes plus anciennes de sa
+commande sont envoyées (ou abandonnées), y compris celles en attente d'une
+nouvelle tentative ou réservées par un autre worker.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+
+from database import AsyncSessionLocal
+from models import NotificationOutbox
+from logger import logger
+from .dispatch import FirebaseTransport, Notification
+
+
+def ajouter(db, agence_id: int, titre: str, corps: str, donnees: Optional[Dict[str, str]] = None) -> NotificationOutbox:
+    """Ajoute la notification à la transaction en cours (sans commit)."""
+    donnees = donnees or {}
+    ligne = NotificationOutbox(
+        agence_id=agence_id,
+        titre=titre,
+        corps=corps,
+        commande_id=int(donnees["commande_id"]) if donnees.get("commande_id") else None,
+        type=donnees.get("type"),
+        donnees=donnees
+    )
+    db.add(ligne)
+    return ligne
+
+
+class RelaisOutbox:
+    """
+    Relais de l'outbox vers FCM.
+
+    Réveillé par `signaler` après chaque commit, et au plus tard toutes les
+    `intervalle` secondes pour les nouvelles tentatives et les lignes écrites
+    par un autre worker. Après un réveil, il attend `fenetre_lot` secondes
+    pour qu'une rafale de commandes parte en un seul appel send_each. Les
+    envois échoués sont retentés avec un délai exponentiel, puis abandonnés
+    après `tentatives_max` essais.
+    """
+
+    def __init__(
+        self,
+        transport=None,
+        intervalle: float = 1.0,
+        fenetre_lot: float = 0.0,
+        taille_lot: int = 500,
+        tentatives_max: int = 5,
+        delai_initial: float = 1.0,
+        delai_max: float = 300.0,
+        retention: float = 86400.0,
+        fabrique_session=None
+    ):
+        self._transport = transport
+        self.intervalle = intervalle
+        self.fenetre_lot = fenetre_lot
+        self.taille_lot = taille_lot
+        self.tentatives_max = tentatives_max
+        self.delai_initial = delai_initial
+        self.delai_max = delai_max
+        self.retention = retention
+        self._fabrique_session = fabrique_session or AsyncSessionLocal
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reveil: Optional[asyncio.Event] = None
+        self._tache: Optional[asyncio.Task] = None
+        self._compteurs = {
+            "lots": 0,
+            "envoyees": 0,
+            "fusionnees": 0,
+            "tentatives_echouees": 0,
+            "abandonnees": 0,
+            "purgees": 0,
+        }
+        # Délai création -> envoi des notifications du dernier lot envoyé
+        self._latence_dernier_lot: Optional[Dict[str, float]] = None
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = FirebaseTransport()
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport):
+        self._transport = transport
+
+    def signaler(self):
+        """Réveille le relais ; appelable depuis la boucle comme depuis un thread."""
+        if self._loop is None:
+            return
+        try:
+            boucle_courante = asyncio.get_running_loop()
+        except RuntimeError:
+            boucle_courante = None
+        if boucle_courante is self._loop:
+            self._reveil.set()
+        else:
+            self._loop.call_soon_threadsafe(self._reveil.set)
+
+    def _delai(self, tentatives: int) -> timedelta:
+        delai = min(self.delai_initial * 2 ** (tentatives - 1), self.delai_max)
+        return timedelta(seconds=delai * random.uniform(0.8, 1.2))
+
+    async def relayer(self) -> int:
+        """
+        Réserve, envoie et marque un lot de notifications.
+
+        Retourne le nombre de lignes traitées (envoyées, fusionnées ou
+        replanifiées) ; les lignes retenues derrière une ligne plus ancienne de
+        leur commande sont prises par un appel suivant.
+        """
+        anterieure = aliased(NotificationOutbox)
+        recente = aliased(NotificationOutbox)
+        async with self._fabrique_session() as db:
+            maintenant = datetime.utcnow()
+            # Au plus la ligne la plus ancienne encore en attente de chaque commande
+            lignes = (await db.scalars(
+                select(NotificationOutbox)
+                .where(
+                    NotificationOutbox.date_envoi.is_(None),
+                    NotificationOutbox.prochain_essai <= maintenant,
+                    ~exists().where(
+                        anterieure.agence_id == NotificationOutbox.agence_id,
+                        anterieure.commande_id == NotificationOutbox.commande_id,
+                        anterieure.id < NotificationOutbox.id,
+                        anterieure.date_envoi.is_(None)
+                    )
+                )
+                .order_by(NotificationOutbox.prochain_essai, NotificationOutbox.id)
+                .limit(self.taille_lot)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not lignes:
+                return 0
+
+            # Une ligne suivie d'une plus récente du même type pour la même
+            # commande n'est pas envoyée : seule la dernière (état final) part
+            remplacees = set((await db.scalars(
+                select(NotificationOutbox.id).where(
+                    NotificationOutbox.id.in_([ligne.id for ligne in lignes]),
+                    exists().where(
+                        recente.agence_id == NotificationOutbox.agence_id,
+                        recente.commande_id == NotificationOutbox.commande_id,
+                        recente.type == NotificationOutbox.type,
+                        recente.id > NotificationOutbox.id,
+                        recente.date_envoi.is_(None)
+                    )
+                )
+            )).all())
+            a_envoyer = []
+            for ligne in lignes:
+                if ligne.id in remplacees:
+                    ligne.date_envoi = maintenant
+                    self._compteurs["fusionnees"] += 1
+                else:
+                    a_envoyer.append(ligne)
+
+            notifications = [
+                Notification(ligne.agence_id, ligne.titre, ligne.corps, dict(ligne.donnees), tentatives=ligne.tentatives)
+                for ligne in a_envoyer
+            ]
+            try:
+                resultats = await self.transport.envoyer_lot(notifications) if notifications else []
+            except Exception as e:
+                resultats = [{"success": False, "error": str(e)}] * len(notifications)
+
+            maintenant = datetime.utcnow()
+            latences = []
+            for ligne, resultat in zip(a_envoyer, resultats):
+                ligne.tentatives += 1
+                if resultat.get("success"):
+                    ligne.date_envoi = maintenant
+                    ligne.erreur = None
+                    self._compteurs["envoyees"] += 1
+                    latences.append((maintenant - ligne.date_creation).total_seconds() * 1000)
+                    continue
+                ligne.erreur = resultat.get("error", "Échec de l'envoi FCM")
+                self._compteurs["tentatives_echouees"] += 1
+                if ligne.tentatives >= self.tentatives_max:
+                    # Abandonnée : sortie de la file, l'erreur reste consultable
+                    ligne.date_envoi = maintenant
+                    self._compteurs["abandonnees"] += 1
+                    logger.error(
+                        f"Notification {ligne.id} pour l'agence {ligne.agence_id} abandonnée "
+                        f"après {ligne.tentatives} tentatives: {ligne.erreur}"
+                    )
+                else:
+                    ligne.prochain_essai = maintenant + self._delai(ligne.tentatives)
+            # Les verrous des lignes sont libérés ici, avec leur nouvel état
+            await db.commit()
+            self._compteurs["lots"] += 1
+            if latences:
+                self._latence_dernier_lot = {
+                    "moyenne_ms": round(sum(latences) / len(latences), 1),
+                    "max_ms": round(max(latences), 1),
+                }
+            return len(lignes)
+
+    async def purger(self) -> int:
+        """Supprime les lignes envoyées depuis plus de `retention` secondes."""
+        limite = datetime.utcnow() - timedelta(seconds=self.retention)
+        async with self._fabrique_session() as db:
+            result = await db.execute(delete(NotificationOutbox).where(NotificationOutbox.date_envoi < limite))
+            await db.commit()
+        self._compteurs["purgees"] += result.rowcount
+        return result.rowcount
+
+    async def _boucle(self):
+        derniere_purge = self._loop.time()
+        while True:
+            try:
+                await asyncio.wait_for(self._reveil.wait(), timeout=self.intervalle)
+                # Laisse arriver le reste de la rafale : un seul appel FCM pour tout le lot
+                if self.fenetre_lot > 0:
+                    await asyncio.sleep(self.fenetre_lot)
+            except asyncio.TimeoutError:
+                pass
+            self._reveil.clear()
+            try:
+                # Jusqu'à épuisement : l'envoi d'une ligne libère la suivante de sa commande
+                while await self.relayer():
+                    pass
+                if self._loop.time() - derniere_purge > 3600:
+                    derniere_purge = self._loop.time()
+                    await self.purger()
+            except Exception as e:
+                logger.error(f"Échec du relais de l'outbox des notifications: {str(e)}")
+
+    async def demarrer(self):
+        """Démarre le relais sur la boucle courante."""
+        if self._tache is None:
+            self._loop = asyncio.get_running_loop()
+            self._reveil = asyncio.Event()
+            self._tache = asyncio.create_task(self._boucle(), name="relais-outbox")
+
+    async def arreter(self):
+        """Arrête le relais ; les lignes non envoyées restent dans l'outbox."""
+        if self._tache is not None:
+            self._tache.cancel()
+            await asyncio.gather(self._tache, return_exceptions=True)
+            self._tache = None
+            self._loop = None
+
+    async def statistiques(self) -> Dict[str, Any]:
+        """Compteurs du worker, profondeur de l'outbox (tous workers) et latence du dernier lot."""
+        # Les métriques restent servies si la base est injoignable
+        try:
+            async with self._fabrique_session() as db:
+                en_attente = await db.scalar(
+                    select(func.count()).select_from(NotificationOutbox).where(NotificationOutbox.date_envoi.is_(None))
+                )
+        except SQLAlchemyError as e:
+            logger.error(f"Profondeur de l'outbox indisponible: {str(e)}")
+            en_attente = None
+        return {
+            **self._compteurs,
+            "en_attente": en_attente,
+            "latence_dernier_lot": self._latence_dernier_lot,
+            "intervalle_secondes": self.intervalle,
+            "fenetre_lot_secondes": self.fenetre_lot,
+            "taille_lot": self.taille_lot,
+        }
+
+
+# Instance singleton du relais
+relais_outbox = RelaisOutbox(
+    intervalle=float(os.getenv("OUTBOX_POLL_SECONDS", "1")),
+    fenetre_lot=float(os.getenv("NOTIFICATION_BATCH_WINDOW_SECONDS", "0.05")),
+    taille_lot=int(os.getenv("OUTBOX_BATCH_SIZE", "500")),
+    tentatives_max=int(os.getenv("NOTIFICATION_MAX_RETRIES", "5")),
+    retention=float(os.getenv("OUTBOX_RETENTION_SECONDS", "86400"))
+)
@@ -0,0 +1,106 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+# Taille de page par défaut et maximale des endpoints de liste
+LIMITE_PAR_DEFAUT = 50
+LIMITE_MAX = 500
+
+
+def encoder_curseur(valeurs: List[Any]) -> str:
+    """Encode les valeurs de la clé de tri de la dernière ligne en curseur opaque."""
+    brut = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in valeurs])
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip("=")
+
+
+def _valeur_colonne(colonne, valeur) -> Any:
+    """Convertit une valeur du curseur au type de sa colonne (ValueError sinon)."""
+    type_python = colonne.type.python_type
+    if type_python is datetime:
+        return datetime.fromisoformat(valeur)
+    if type_python is int:
+        # bool est un int en Python ; un flottant serait tronqué en silence
+        if isinstance(valeur, (bool, float)):
+            raise ValueError(f"entier attendu pour {colonne.key}")
+        return int(valeur)
+    if not isinstance(valeur, type_python):
+        raise ValueError(f"{type_python.__name__} attendu pour {colonne.key}")
+    return valeur
+
+
+def decoder_curseur(curseur: str, colonnes) -> List[Any]:
+    """Décode un curseur produit par encoder_curseur pour les colonnes données."""
+    try:
+        brut = base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4))
+        valeurs = json.loads(brut)
+        if not isinstance(valeurs, list) or len(valeurs) != len(colonnes):
+            raise ValueError("nombre de valeurs incorrect")
+        # Un curseur forgé ne doit pas atteindre la base avec des valeurs du mauvais type
+        return [_valeur_colonne(colonne, valeur) for colonne, valeur in zip(colonnes, valeurs)]
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide"
+        )
+
+
+def requete_page(
+    query,
+    colonnes,
+    curseur: Optional[str] = None,
+    limit: int = LIMITE_PAR_DEFAUT,
+    descendant: bool = False
+):
+    """
+    Applique le filtre de curseur, le tri et la limite à une requête ORM
+    (Query sync ou select() pour les sessions async).
+
+    Args:
+        query: Requête déjà filtrée
+        colonnes: Colonnes formant la clé de tri unique, ex. (Commande.date_creation, Commande.id)
+        curseur: Curseur renvoyé par la page précédente
+        limit: Nombre maximal de lignes à retourner
+        descendant: Tri du plus récent au plus ancien
+    """
+    if curseur:
+        valeurs = decoder_curseur(curseur, colonnes)
+        if len(colonnes) == 1:
+            cle, borne = colonnes[0], valeurs[0]
+        else:
+            cle, borne = tuple_(*colonnes), tuple(valeurs)
+        query = query.filter(cle < borne if descendant else cle > borne)
+
+    ordre = [colonne.desc() if descendant else colonne.asc() for colonne in colonnes]
+    # Une ligne de plus que demandé pour savoir s'il existe une page suivante
+    return query.order_by(*ordre).limit(limit + 1)
+
+
+def decouper_page(lignes: list, colonnes, limit: int) -> Tuple[list, Optional[str]]:
+    """Retourne les lignes de la page et le curseur de la suivante (None si dernière page)."""
+    next_cursor = None
+    if len(lignes) > limit:
+        lignes = lignes[:limit]
+        dernier = lignes[-1]
+        next_cursor = encoder_curseur([getattr(dernier, colonne.key) for colonne in colonnes])
+    return lignes, next_cursor
+
+
+def paginer(
+    query,
+    colonnes,
+    curseur: Optional[str] = None,
+    limit: int = LIMITE_PAR_DEFAUT,
+    descendant: bool = False
+) -> Tuple[list, Optional[str]]:
+    """
+    Applique une pagination par clé (keyset) à une requête ORM sync.
+
+    Returns:
+        Les lignes de la page et le curseur de la page suivante (None si dernière page)
+    """
+    lignes = requete_page(query, colonnes, curseur, limit, descendant).all()
+    return decouper_page(lignes, colonnes, limit)
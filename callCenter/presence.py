@@ -0,0 +1,146 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+
+from database import AsyncSessionLocal
+from logger import logger
+from models import Tablette
+
+
+@dataclass
+class EtatTablette:
+    """État d'une tablette tel que servi par /tablettes/verifier."""
+    id: int
+    agence_id: int
+    est_active: bool
+    derniere_syncro: datetime
+    charge_le: float = field(default_factory=time.monotonic)
+
+
+class PresenceTablettes:
+    """
+    Carte de présence des tablettes, en mémoire du processus.
+
+    Les vérifications de statut sont servies depuis la carte et ne font que
+    noter l'heure du dernier battement ; les battements en attente sont écrits
+    en base par lot (un seul UPDATE executemany) toutes les `intervalle`
+    secondes, et une dernière fois à l'arrêt.
+
+    Une entrée est rechargée depuis la base après `ttl` secondes, pour qu'un
+    worker voie les activations/désactivations faites par un autre worker.
+    Thread-safe : configurer/désactiver tournent dans le threadpool.
+    """
+
+    def __init__(self, intervalle: float = 10.0, ttl: float = 60.0, fabrique_session=None):
+        self.intervalle = intervalle
+        self.ttl = ttl
+        self._fabrique_session = fabrique_session or AsyncSessionLocal
+        self._etats: Dict[str, EtatTablette] = {}
+        self._a_ecrire: Dict[int, datetime] = {}
+        self._verrou = threading.Lock()
+        self._tache: Optional[asyncio.Task] = None
+        self._compteurs = {"battements": 0, "chargements": 0, "ecritures": 0, "lignes_ecrites": 0, "echecs": 0}
+
+    def get(self, numero_serie: str) -> Optional[EtatTablette]:
+        """État connu de la tablette, ou None s'il faut le (re)charger depuis la base."""
+        with self._verrou:
+            etat = self._etats.get(numero_serie)
+            if etat is None or time.monotonic() - etat.charge_le > self.ttl:
+                return None
+            return etat
+
+    def charger(self, tablette: Tablette) -> EtatTablette:
+        """Place (ou remplace) l'état d'une tablette lue ou écrite en base."""
+        with self._verrou:
+            derniere_syncro = tablette.derniere_syncro
+            ancien = self._etats.get(tablette.numero_serie)
+            # Ne pas perdre un battement plus récent encore en attente d'écriture
+            if ancien is not None and ancien.derniere_syncro > derniere_syncro:
+                derniere_syncro = ancien.derniere_syncro
+            etat = EtatTablette(
+                id=tablette.id,
+                agence_id=tablette.agence_id,
+                est_active=tablette.est_active,
+                derniere_syncro=derniere_syncro
+            )
+            self._etats[tablette.numero_serie] = etat
+            self._compteurs["chargements"] += 1
+            return etat
+
+    def battement(self, etat: EtatTablette) -> EtatTablette:
+        """Note le passage de la tablette ; l'écriture en base est différée."""
+        with self._verrou:
+            etat.derniere_syncro = datetime.utcnow()
+            self._a_ecrire[etat.id] = etat.derniere_syncro
+            self._compteurs["battements"] += 1
+            return etat
+
+    async def vider(self) -> int:
+        """Écrit en base les battements en attente. Retourne le nombre de tablettes mises à jour."""
+        with self._verrou:
+            lot, self._a_ecrire = self._a_ecrire, {}
+        if not lot:
+            return 0
+        try:
+            async with self._fabrique_session() as db:
+                # UPDATE par clé primaire, envoyé en un seul executemany
+                await db.execute(
+                    update(Tablette),
+                    [{"id": tablette_id, "derniere_syncro": date} for tablette_id, date in lot.items()]
+                )
+                await db.commit()
+        except Exception as e:
+            # Remettre le lot en attente sans écraser un battement plus récent
+            with self._verrou:
+                for tablette_id, date in lot.items():
+                    if self._a_ecrire.get(tablette_id, date) <= date:
+                        self._a_ecrire[tablette_id] = date
+            self._compteurs["echecs"] += 1
+            logger.error(f"Échec de l'écriture de {len(lot)} battement(s) de tablettes: {str(e)}")
+            return 0
+        self._compteurs["ecritures"] += 1
+        self._compteurs["lignes_ecrites"] += len(lot)
+        # Le cache de la liste /tablettes n'est pas invalidé ici : seuls les
+        # changements d'est_active ou de l'ensemble des tablettes l'invalident
+        # (configurer/désactiver) ; derniere_syncro y a au plus REFERENCE_CACHE_TTL de retard
+        return len(lot)
+
+    async def _boucle(self):
+        while True:
+            await asyncio.sleep(self.intervalle)
+            await self.vider()
+
+    async def demarrer(self):
+        """Démarre l'écriture périodique sur la boucle courante."""
+        if self._tache is None:
+            self._tache = asyncio.create_task(self._boucle(), name="presence-tablettes")
+
+    async def arreter(self):
+        """Arrête l'écriture périodique et écrit les derniers battements."""
+        if self._tache is not None:
+            self._tache.cancel()
+            await asyncio.gather(self._tache, return_exceptions=True)
+            self._tache = None
+        await self.vider()
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            return {
+                **self._compteurs,
+                "tablettes": len(self._etats),
+                "en_attente": len(self._a_ecrire),
+                "intervalle_secondes": self.intervalle,
+            }
+
+
+# Instance singleton de la carte de présence
+presence_tablettes = PresenceTablettes(
+    intervalle=float(os.getenv("TABLET_HEARTBEAT_FLUSH_SECONDS", "10")),
+    ttl=float(os.getenv("TABLET_PRESENCE_TTL", "60"))
+)
@@ -0,0 +1,113 @@
+"""
+Recherche de clients par préfixe de téléphone ou de nom.
+
+Les requêtes produites s'appuient sur les index de la révision a3d9e5f7b210 :
+- téléphone : intervalle [préfixe, préfixe suivant) sur l'index unique de
+  telephone_normalise (B-tree, quel que soit le dialecte) ;
+- nom/prénom : sous PostgreSQL, LIKE 'préfixe%' et similarité pg_trgm (%)
+  sur les index GIN de lower(nom)/lower(prenom) ; ailleurs, intervalle sur
+  les index B-tree de lower(nom)/lower(prenom).
+"""
+import re
+
+from sqlalchemy import and_, false, func, or_, select, union
+
+from models import Client
+from telephone import INDICATIF_PAYS
+
+# Nombre maximal de résultats, quelle que soit la limite demandée
+LIMITE_RECHERCHE_MAX = 50
+
+# Lignes lues au plus sur chaque index de nom avant le tri par pertinence
+_CANDIDATS_PAR_INDEX = 10 * LIMITE_RECHERCHE_MAX
+
+# En dessous de 3 caractères, un terme n'a pas de trigramme : préfixe seul
+_LONGUEUR_MIN_TRIGRAMME = 3
+
+
+def _borne_superieure(prefixe: str) -> str:
+    """Plus petite chaîne supérieure à toutes celles qui commencent par `prefixe`."""
+    return prefixe[:-1] + chr(ord(prefixe[-1]) + 1)
+
+
+def _prefixe_telephone(q: str) -> str:
+    """
+    Début de numéro sous forme normalisée. Contrairement à un numéro complet,
+    un préfixe saisi au format international (+224..., 00224...) peut être
+    plus court que 9 chiffres : l'indicatif est retiré dès qu'il est annoncé.
+    """
+    q = q.strip()
+    chiffres = re.sub(r"\D", "", q)
+    international = q.startswith("+") or chiffres.startswith("00")
+    if chiffres.startswith("00"):
+        chiffres = chiffres[2:]
+    if chiffres.startswith(INDICATIF_PAYS) and (international or len(chiffres) > 9):
+        chiffres = chiffres[len(INDICATIF_PAYS):]
+    return chiffres
+
+
+def _intervalle(expression, prefixe: str):
+    return and_(expression >= prefixe, expression < _borne_superieure(prefixe))
+
+
+def requete_recherche_clients(q: str, limite: int, dialecte: str):
+    """
+    Construit la requête de recherche pour le terme `q`.
+    Un terme fait de chiffres (espaces, + et tirets tolérés) est un préfixe de
+    téléphone ; sinon chaque mot doit être le début (ou, sous PostgreSQL,
+    une approximation) du nom ou du prénom.
+    """
+    limite = min(limite, LIMITE_RECHERCHE_MAX)
+    query = select(Client)
+
+    if q.replace(" ", "").replace("-", "").lstrip("+").isdigit():
+        prefixe = _prefixe_telephone(q)
+        if not prefixe:
+            # Seul l'indicatif a été saisi : trop peu sélectif
+            return query.where(false()).limit(limite)
+        return (
+            query.where(_intervalle(Client.telephone_normalise, prefixe))
+            .order_by(Client.telephone_normalise)
+            .limit(limite)
+        )
+
+    nom, prenom = func.lower(Client.nom), func.lower(Client.prenom)
+    termes = q.lower().split()
+    if not termes:
+        return query.where(false()).limit(limite)
+
+    def correspond(colonne, terme):
+        if dialecte == "postgresql":
+            conditions = [colonne.startswith(terme, autoescape=True)]
+            if len(terme) >= _LONGUEUR_MIN_TRIGRAMME:
+                conditions.append(colonne.op("%")(terme))
+            return or_(*conditions)
+        return _intervalle(colonne, terme)
+
+    # Chaque terme doit correspondre au nom ou au prénom
+    filtres = [or_(correspond(nom, terme), correspond(prenom, terme)) for terme in termes]
+
+    # Candidats : au plus _CANDIDATS_PAR_INDEX lignes lues sur chaque index
+    # (nom, prénom) à partir du premier terme. Le tri final ne porte que sur
+    # ces candidats, quel que soit le nombre de clients du préfixe.
+    branches = []
+    for colonne in (nom, prenom):
+        branche = select(Client.id).where(correspond(colonne, termes[0]), *filtres)
+        if dialecte != "postgresql":
+            # Parcours de l'index B-tree dans l'ordre : arrêt dès la limite atteinte
+            branche = branche.order_by(colonne)
+        branches.append(branche.limit(_CANDIDATS_PAR_INDEX).subquery())
+    candidats = union(*(select(branche.c.id) for branche in branches))
+    query = query.where(Client.id.in_(candidats))
+
+    if dialecte == "postgresql":
+        texte = " ".join(termes)
+        pertinence = func.greatest(
+            func.similarity(nom, texte),
+            func.similarity(prenom, texte),
+            func.similarity(nom + " " + prenom, texte)
+        )
+        query = query.order_by(pertinence.desc(), Client.id)
+    else:
+        query = query.order_by(nom, prenom, Client.id)
+    return query.limit(limite)
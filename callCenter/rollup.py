@@ -0,0 +1,107 @@
+"""
+Cumul journalier des commandes par agence (table statistiques_agences_jour).
+
+Les endpoints de commandes appliquent les mouvements dans leur propre
+transaction ; la commande `rebuild` recalcule la table depuis `commandes` :
+
+    python -m callCenter.rollup rebuild [--agence ID]
+"""
+import argparse
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Commande, StatistiqueAgenceJour
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def requete_cumul(dialecte: str, agence_id: int, jour: date, status: str, nombre: int, montant: int):
+    """
+    Upsert ajoutant `nombre` commandes et `montant` au cumul (agence, jour, statut).
+    Un mouvement négatif retire une commande du cumul de son ancien statut.
+    """
+    table = StatistiqueAgenceJour.__table__
+    requete = _INSERTS[dialecte](table).values(
+        agence_id=agence_id,
+        jour=jour,
+        status=status,
+        nombre_commandes=nombre,
+        montant_total=montant
+    )
+    return requete.on_conflict_do_update(
+        index_elements=[table.c.agence_id, table.c.jour, table.c.status],
+        set_={
+            "nombre_commandes": table.c.nombre_commandes + requete.excluded.nombre_commandes,
+            "montant_total": table.c.montant_total + requete.excluded.montant_total,
+        }
+    )
+
+
+def requetes_nouvelle_commande(dialecte: str, commande: Commande) -> List:
+    return [requete_cumul(
+        dialecte, commande.agence_id, commande.date_creation.date(),
+        commande.status, 1, commande.montant_total
+    )]
+
+
+def requetes_changement_statut(dialecte: str, commande: Commande, ancien_status: str) -> List:
+    """Déplace la commande du cumul de son ancien statut vers celui du nouveau."""
+    if ancien_status == commande.status:
+        return []
+    jour = commande.date_creation.date()
+    return [
+        requete_cumul(dialecte, commande.agence_id, jour, ancien_status, -1, -commande.montant_total),
+        requete_cumul(dialecte, commande.agence_id, jour, commande.status, 1, commande.montant_total),
+    ]
+
+
+def reconstruire(db, agence_id: Optional[int] = None) -> int:
+    """
+    Recalcule le cumul depuis la table des commandes, en une transaction.
+    Retourne le nombre de lignes de cumul écrites.
+    """
+    suppression = delete(StatistiqueAgenceJour)
+    calcul = select(
+        Commande.agence_id,
+        func.date(Commande.date_creation),
+        Commande.status,
+        func.count(Commande.id),
+        func.sum(Commande.montant_total)
+    )
+    if agence_id is not None:
+        suppression = suppression.where(StatistiqueAgenceJour.agence_id == agence_id)
+        calcul = calcul.where(Commande.agence_id == agence_id)
+    calcul = calcul.group_by(Commande.agence_id, func.date(Commande.date_creation), Commande.status)
+
+    db.execute(suppression)
+    resultat = db.execute(
+        insert(StatistiqueAgenceJour).from_select(
+            ["agence_id", "jour", "status", "nombre_commandes", "montant_total"],
+            calcul
+        )
+    )
+    db.commit()
+    return resultat.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m callCenter.rollup", description=__doc__.strip().splitlines()[0])
+    commandes = parser.add_subparsers(dest="commande", required=True)
+    rebuild = commandes.add_parser("rebuild", help="Recalculer le cumul depuis la table des commandes")
+    rebuild.add_argument("--agence", type=int, default=None, help="Limiter le recalcul à une agence")
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        lignes = reconstruire(db, args.agence)
+    finally:
+        db.close()
+    print(f"{lignes} ligne(s) de cumul reconstruite(s)")
+
+
+if __name__ == "__main__":
+    main()
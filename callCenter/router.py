@@ -1,18 +1,37 @@
-from fastapi import Depends, HTTPException, File, Form, APIRouter, status, Request,Query
+from fastapi import Depends, HTTPException, File, Form, APIRouter, status, Request,Query, Header
 from fastapi.param_functions import Body
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from database import *
 from typing import List, Optional
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
-from datetime import datetime
+from datetime import date, datetime
+import os
 import uuid
 from models import *
 from utiles import *
 from logger import *
+from cache import caches
+from telephone import normaliser_telephone
 from . import schemas
-from .firebase_service import firebase_service
+from .events import flux_sse, order_events
+from .presence import presence_tablettes
+from .compteurs import compteurs_sessions, incrementer_compteur
+from .jetons import maintenance_jetons
+from . import outbox
+from .outbox import relais_outbox
+from demarrage import chrono_demarrage
+from . import rollup
+from .recherche import LIMITE_RECHERCHE_MAX, requete_recherche_clients
+from .etag import agences_reponses, reponse_conditionnelle, tablettes_reponses, utilisateurs_reponses
+from .serialisation import reponse_json
+from .exports import FORMATS_EXPORT, flux_export
+from .pagination import LIMITE_MAX, LIMITE_PAR_DEFAUT, decouper_page, encoder_curseur, paginer, requete_page
   # Import relatif correct
 
 router = APIRouter(
@@ -35,7 +54,7 @@ notification_service = None
 ##           Connecter un Utilisateur et generer un Token        ##
 ##===============================================================##
 @router.post("/login", response_model=schemas.LoginResponse, tags=["Authentication"])
-def login(user_access: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(user_access: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # Vérification que l'identifiant et le mot de passe sont fournis
    if not user_access.username or not user_access.password:
       raise HTTPException(
@@ -44,15 +63,17 @@ def login(user_access: OAuth2PasswordRequestForm = Depends(), db: Session = Depe
       )
 
     # Récupération de l'utilisateur depuis la base de données
-   user = db.query(User).filter(User.email == user_access.username).first()
+   user = await run_in_threadpool(
+      lambda: db.query(User).filter(User.email == user_access.username).first()
+   )
    if not user:
       raise HTTPException(
          status_code=status.HTTP_401_UNAUTHORIZED,
          detail="Les accès fournis sont incorrects"
       )
     
-    # Vérification du mot de passe
-   if not verify_password(user_access.password, user.password):
+    # Vérification du mot de passe sur le pool bcrypt dédié (503 si saturé)
+   if not await verify_password_async(user_access.password, user.password):
       raise HTTPException(
          status_code=status.HTTP_401_UNAUTHORIZED,
          detail="Le mot de passe fourni n'est pas le bon"
@@ -74,48 +95,38 @@ def login(user_access: OAuth2PasswordRequestForm = Depends(), db: Session = Depe
 ##===============================================================##
 @router.get("/current_user", response_model=schemas.UserResponse, tags=["Authentication"])
 def read_users_me(
-   current_user: schemas.UserResponse = Depends(get_current_user),
-   db: Session = Depends(get_db)
+   current_user: schemas.UserResponse = Depends(get_current_user)
 ):
    """
    Endpoint pour récupérer les informations de l'utilisateur actuel.
+   L'utilisateur est déjà chargé (et mis en cache) par get_current_user.
    """
-   # Récupérer l'utilisateur actuel depuis la base de données
-   user = db.query(User).filter(User.id == current_user.id).first()
-
-   if user is None:
-      raise HTTPException(
-         status_code=status.HTTP_404_NOT_FOUND,
-         detail="Aucun utilisateur ne correspond à vos paramètres de recherche"
-   )
-
    # Retourner les informations de l'utilisateur (sans le mot de passe)
-   return schemas.UserResponse(
-      id=user.id,
-      agence_id=user.agence_id,
-      nom=user.nom,
-      prenom=user.prenom,
-      email=user.email,
-      telephone=user.telephone,
-      role=user.role,
-      derniere_connexion=user.derniere_connexion,
-      derniere_deconnexion=user.derniere_deconnexion
-   )
+   return current_user
 
 ##===============================================================##
 ##         Récupérer des utilisateurs                            ##
 ##===============================================================##
-@router.get("/utilisateurs", response_model=List[schemas.UserResponse], tags=["Utilisateurs"])
+@router.get("/utilisateurs", response_model=schemas.UserPage, tags=["Utilisateurs"])
 def get_utilisateurs(
+   request: Request,
+   limit: int = Query(LIMITE_PAR_DEFAUT, ge=1, le=LIMITE_MAX),
+   cursor: Optional[str] = Query(None, description="Curseur retourné par la page précédente"),
    db: Session = Depends(get_db),
 ):
     """
-    Endpoint pour récupérer la liste de tous les utilisateurs.
+    Endpoint pour récupérer la liste des utilisateurs, page par page.
+    Réponse servie depuis le cache avec un ETag (304 si If-None-Match correspond).
     """
+    entree = utilisateurs_reponses.get((limit, cursor))
+    if entree is None:
+        utilisateurs, next_cursor = paginer(db.query(User), (User.id,), cursor, limit)
+        entree = utilisateurs_reponses.enregistrer(
+            (limit, cursor),
+            schemas.UserPage.model_validate({"items": utilisateurs, "next_cursor": next_cursor}, from_attributes=True)
+        )
     
-    utilisateurs = db.query(User).all()
-    
-    return utilisateurs
+    return reponse_conditionnelle(request, entree)
 
 ##===============================================================##
 ##         Récupérer des utilisateurs                            ##
@@ -138,7 +149,7 @@ def create_utilisateur(
         )
     
     # Hasher le mot de passe
-    hashed_password = hash_password(user_data.password)
+    hashed_password = hash_password_pool(user_data.password)
     
     # Créer le nouvel utilisateur
     new_user = User(
@@ -156,6 +167,8 @@ def create_utilisateur(
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalider_utilisateur(new_user.id)
+    utilisateurs_reponses.invalider()
     
     return new_user
 
@@ -183,6 +196,7 @@ def create_agence(
    db.add(db_agence)
    db.commit()
    db.refresh(db_agence)
+   agences_reponses.invalider()
 
    # Retourner l'agence créée
    return db_agence
@@ -190,25 +204,35 @@ def create_agence(
 ##===============================================================##
 ##                   Récupérer la liste des agences              ##
 ##===============================================================##
-@router.get("/agences", response_model=List[schemas.AgenceResponse], tags=["Agences"])
+@router.get("/agences", response_model=schemas.AgencePage, tags=["Agences"])
 def get_agences(
+    request: Request,
+    limit: int = Query(LIMITE_PAR_DEFAUT, ge=1, le=LIMITE_MAX),
+    cursor: Optional[str] = Query(None, description="Curseur retourné par la page précédente"),
     db: Session = Depends(get_db)
 ):
    """
-   Endpoint pour récupérer la liste de toutes les agences.
+   Endpoint pour récupérer la liste des agences, page par page.
+   Réponse servie depuis le cache avec un ETag (304 si If-None-Match correspond).
    """
-   # Récupérer toutes les agences depuis la base de données
-   agences = db.query(Agence).all()
+   entree = agences_reponses.get((limit, cursor))
+   if entree is None:
+      # Récupérer une page d'agences depuis la base de données
+      agences, next_cursor = paginer(db.query(Agence), (Agence.id,), cursor, limit)
 
-   # Si aucune agence n'est trouvée, retourner une erreur 404
-   if not agences:
-      raise HTTPException(
-         status_code=status.HTTP_404_NOT_FOUND,
-         detail="Aucune agence trouvée"
-   )
+      # Si aucune agence n'est trouvée, retourner une erreur 404
+      if not agences and cursor is None:
+         raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Aucune agence trouvée"
+      )
+      entree = agences_reponses.enregistrer(
+         (limit, cursor),
+         schemas.AgencePage.model_validate({"items": agences, "next_cursor": next_cursor}, from_attributes=True)
+      )
 
-   # Retourner la liste des agences
-   return agences
+   # Retourner la page d'agences
+   return reponse_conditionnelle(request, entree)
 
 ##===============================================================##
 ##                       Créer un client                         ##
@@ -221,8 +245,15 @@ def create_client(
    """
    Endpoint pour créer un nouveau client.
    """
-   # Vérifier si un client avec le même téléphone existe déjà
-   existing_client = db.query(Client).filter(Client.telephone == client.telephone).first()
+   telephone_normalise = normaliser_telephone(client.telephone)
+   if not telephone_normalise:
+      raise HTTPException(
+         status_code=status.HTTP_400_BAD_REQUEST,
+         detail="Numéro de téléphone invalide"
+      )
+
+   # Vérifier si un client avec le même téléphone existe déjà, quel que soit le format saisi
+   existing_client = db.query(Client.id).filter(Client.telephone_normalise == telephone_normalise).first()
    if existing_client:
       raise HTTPException(
          status_code=status.HTTP_400_BAD_REQUEST,
@@ -240,26 +271,61 @@ def create_client(
 
    # Ajouter le client à la base de données
    db.add(db_client)
-   db.commit()
+   try:
+      db.commit()
+   except IntegrityError:
+      # Création concurrente du même numéro
+      db.rollback()
+      raise HTTPException(
+         status_code=status.HTTP_400_BAD_REQUEST,
+         detail="Un client avec ce numéro de téléphone existe déjà"
+      )
    db.refresh(db_client)
+   invalider_client(telephone_normalise)
 
    # Retourner le client créé
    return db_client
 
+##===============================================================##
+##          Rechercher des clients (téléphone ou nom)            ##
+##===============================================================##
+# Déclaré avant /clients/{telephone}, qui capturerait "search"
+@router.get("/clients/search", response_model=List[schemas.ClientResponse], tags=["Clients"])
+async def rechercher_clients(
+   q: str = Query(..., min_length=2, max_length=50, description="Début du numéro, du nom ou du prénom"),
+   limit: int = Query(20, ge=1, le=LIMITE_RECHERCHE_MAX),
+   db: AsyncSession = Depends(get_async_db)
+):
+   """
+   Endpoint pour retrouver un client à partir d'un numéro partiel
+   ("62955", "+224 629") ou du début de son nom/prénom ("dia awa").
+   Sous PostgreSQL, les noms proches sont aussi retournés (pg_trgm).
+   """
+   result = await db.execute(requete_recherche_clients(q, limit, nom_dialecte(db)))
+   return result.scalars().all()
+
 ##===============================================================##
 ##                   Récupérer un client par téléphone          ##
 ##===============================================================##
 @router.get("/clients/{telephone}", response_model=schemas.ClientResponse, tags=["Clients"])
-def get_client_by_phone(telephone: str, db: Session = Depends(get_db)):
+async def get_client_by_phone(telephone: str, db: AsyncSession = Depends(get_async_db)):
    """
-   Endpoint pour récupérer un client via son numéro de téléphone.
+   Endpoint pour récupérer un client via son numéro de téléphone, quel que
+   soit son format ("+224629553504", "629 55 35 04", ...).
+   Servi depuis le cache des clients quand c'est possible.
    """
-   client = db.query(Client).filter(Client.telephone == telephone).first()
-   if not client:
-      raise HTTPException(
-         status_code=status.HTTP_404_NOT_FOUND,
-         detail="Client non trouvé"
-      )
+   telephone_normalise = normaliser_telephone(telephone)
+   client = clients_cache.get(telephone_normalise)
+   if client is None:
+      result = await db.execute(select(Client).where(Client.telephone_normalise == telephone_normalise))
+      db_client = result.scalars().first()
+      if not db_client:
+         raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Client non trouvé"
+         )
+      client = schemas.ClientResponse.model_validate(db_client)
+      clients_cache.set(telephone_normalise, client)
 
    return client
 
@@ -345,12 +411,24 @@ async def submit_order(order: schemas.CommandeCreate, db: Session = Depends(get_
 ##                      Soumettre une commande                   ##
 ##===============================================================##
 @router.post("/commande", response_model=schemas.CommandeResponse, tags=["Commandes"])
-def submit_order(order: schemas.CommandeCreate, db: Session = Depends(get_db)):
+async def submit_order(order: schemas.CommandeCreate, db: AsyncSession = Depends(get_async_db)):
    """
     Endpoint pour soumettre une nouvelle commande.
    """
-   # Logique existante...
-    
+   # Calcul des sous-totaux et du montant total en un seul passage
+   lignes = []
+   total_montant = 0
+   for item in order.lignes_commandes:
+      sous_total = item.quantite * item.prix_unitaire
+      lignes.append({
+         "nom_article": item.nom_article,
+         "reference_article": item.reference_article,
+         "quantite": item.quantite,
+         "prix_unitaire": item.prix_unitaire,
+         "sous_totaux": sous_total
+      })
+      total_montant += sous_total
+
    # Création de la commande
    new_order = Commande(
       client_id=order.client_id,
@@ -360,66 +438,79 @@ def submit_order(order: schemas.CommandeCreate, db: Session = Depends(get_db)):
       date_creation=datetime.utcnow(),
       date_reception=None,
       status="envoyée",  # Changement à 'envoyée' pour correspondre au flux de statut de l'app mobile
-      montant_total=0,  # Sera calculé après
+      montant_total=total_montant,
       notes=order.notes
    )
 
+   # Le flush attribue l'id de la commande sans valider la transaction
    db.add(new_order)
-   db.commit()
-   db.refresh(new_order)
+   await db.flush()
 
-   total_montant = 0
+   # Insertion de toutes les lignes en un seul executemany
+   if lignes:
+      for ligne in lignes:
+         ligne["commande_id"] = new_order.id
+      await db.execute(insert(LigneCommande), lignes)
+
+   # Cumul journalier de l'agence, dans la même transaction
+   for requete in rollup.requetes_nouvelle_commande(nom_dialecte(db), new_order):
+      await db.execute(requete)
 
-   # Création des lignes de commande...
-    
-   # Mise à jour du montant total de la commande
-   new_order.montant_total = total_montant
-   db.commit()
-   db.refresh(new_order)
-    
    # Récupérer les informations du client
-   client = db.query(Client).filter(Client.id == order.client_id).first()
+   client = await db.get(Client, order.client_id)
+
+   # Construire la réponse et la notification
+   response = schemas.CommandeResponse.model_validate(new_order)
+   client_nom = f"{client.nom} {client.prenom}" if client else "Client inconnu"
+   notification_data = {
+      "commande_id": str(response.id),
+      "client_nom": client_nom,
+      "client_telephone": client.telephone if client else "",
+      "montant_total": str(total_montant),
+      "type": "nouvelle_commande"
+   }
+
+   # Notification des tablettes de l'agence, validée avec la commande
+   outbox.ajouter(
+      db,
+      agence_id=order.agence_id,
+      titre="Nouvelle commande !",
+      corps=f"Commande #{response.id} pour {client_nom}",
+      donnees=notification_data
+   )
+
+   # Une seule transaction pour l'en-tête, les lignes et la notification
+   await db.commit()
+   relais_outbox.signaler()
     
-   # Envoyer une notification aux tablettes de l'agence
-   try:
-      # Données supplémentaires à inclure dans la notification
-      notification_data = {
-         "commande_id": str(new_order.id),
-         "client_nom": f"{client.nom} {client.prenom}",
-         "client_telephone": client.telephone,
-         "montant_total": str(total_montant),
-         "type": "nouvelle_commande"
-      }
-        
-      firebase_service.send_notification_to_agency(
-         agency_id=order.agence_id,
-         title="Nouvelle commande !",
-         body=f"Commande #{new_order.id} pour {client.nom} {client.prenom}",
-         data=notification_data,
-         db=db
-      )
-   except Exception as e:
-      # Log l'erreur mais continue le processus
-      logger.error(f"Erreur lors de l'envoi de la notification: {str(e)}")
+   # Diffusion immédiate aux flux SSE ouverts sur l'agence
+   order_events.publier(order.agence_id, "nouvelle_commande", {
+      "commande_id": response.id,
+      "statut": response.status,
+      "montant_total": response.montant_total,
+      "client_nom": client_nom,
+      "date_creation": response.date_creation
+   })
 
-   return new_order
+   return response
 
 
 ##===============================================================##
 ##             Mettre à jour une commande                        ##
 ##===============================================================##
 @router.put("/commandes/{commande_id}", response_model=schemas.CommandeResponse, tags=["Commandes"])
-def mettre_a_jour_commande(
+async def mettre_a_jour_commande(
    commande_id: int,
    commande_update: schemas.CommandeUpdate,
    current_user: UserResponse = Depends(role_required(["agent_restaurant"])),
-   db: Session = Depends(get_db)
+   db: AsyncSession = Depends(get_async_db)
 ):
    """
    Endpoint pour mettre à jour une commande existante.
    """
-   # Récupérer la commande depuis la base de données
-   commande = db.query(Commande).filter(Commande.id == commande_id).first()
+   # Récupérer la commande depuis la base de données, verrouillée jusqu'au
+   # commit : deux changements concurrents ne lisent pas le même ancien statut
+   commande = await db.get(Commande, commande_id, with_for_update=True)
    if not commande:
       raise HTTPException(
          status_code=status.HTTP_404_NOT_FOUND,
@@ -427,6 +518,7 @@ def mettre_a_jour_commande(
       )
 
    # Mettre à jour les champs fournis
+   ancien_status = commande.status
    if commande_update.status is not None:
       commande.status = commande_update.status
    if commande_update.notes is not None:
@@ -435,44 +527,25 @@ def mettre_a_jour_commande(
    commande.recepteur_id = current_user.id
    # Ajoutez d'autres champs si nécessaire
 
+   for requete in rollup.requetes_changement_statut(nom_dialecte(db), commande, ancien_status):
+      await db.execute(requete)
+
    # Enregistrer les modifications dans la base de données
-   db.commit()
-   db.refresh(commande)
+   await db.commit()
+   _publier_mise_a_jour(commande)
 
    # Retourner la commande mise à jour
    return commande
 
 ##===============================================================##
-##        Récupérer les détails d'une commande spécifique.       ##
+##        Construction de la réponse détaillée d'une commande    ##
 ##===============================================================##
-@router.get("/commandes/{commande_id}", response_model=schemas.CommandeDetailResponse, tags=["Commandes"])
-def get_commande_details(
-   commande_id: int,
-   db: Session = Depends(get_db),
-   current_user: UserResponse = Depends(get_current_user)
-):
+def _serialiser_commande_detail(commande):
    """
-   Endpoint pour récupérer les détails d'une commande spécifique.
+   Construit le dictionnaire CommandeDetailResponse à partir d'une commande
+   dont le client et les lignes ont déjà été chargés (joinedload/selectinload).
    """
-   # Récupérer la commande
-   commande = db.query(Commande).filter(Commande.id == commande_id).first()
-    
-   if not commande:
-      raise HTTPException(
-         status_code=status.HTTP_404_NOT_FOUND,
-         detail="Commande non trouvée"
-      )
-    
-   # Récupérer les informations du client
-   client = db.query(Client).filter(Client.id == commande.client_id).first()
-    
-   # Récupérer les informations du récepteur
-   recepteur = db.query(User).filter(User.id == commande.recepteur_id).first()
-    
-   # Récupérer les lignes de commande
-   lignes = db.query(LigneCommande).filter(LigneCommande.commande_id == commande.id).all()
-    
-   # Construire l'objet de réponse
+   client = commande.client
    commande_detail = {
       "id": commande.id,
       "client_id": commande.client_id,
@@ -482,7 +555,6 @@ def get_commande_details(
       "agence_id": commande.agence_id,
       "createur_id": commande.createur_id,
       "recepteur_id": commande.recepteur_id,
-      "recepteur_nom": f"{recepteur.prenom} {recepteur.nom}" if recepteur else None,
       "date_creation": commande.date_creation,
       "date_reception": commande.date_reception,
       "statut": commande.status,
@@ -496,75 +568,176 @@ def get_commande_details(
             "quantite": ligne.quantite,
             "prix_unitaire": ligne.prix_unitaire,
             "sous_total": ligne.sous_totaux
-         } for ligne in lignes
+         } for ligne in commande.lignecommande
       ]
    }
-    
    return commande_detail
+
+##===============================================================##
+##        Filtres communs des listes de commandes                ##
+##===============================================================##
+def filtres_commandes(
+   status: Optional[str] = Query(None, description="Ne retourner que les commandes de ce statut"),
+   date_debut: Optional[datetime] = Query(None, description="Date de création minimale (incluse)"),
+   date_fin: Optional[datetime] = Query(None, description="Date de création maximale (incluse)")
+):
+   """Dépendance regroupant les filtres de statut et de période des listes de commandes."""
+   return {"status": status, "date_debut": date_debut, "date_fin": date_fin}
+
+def _filtrer_commandes(query, status=None, date_debut=None, date_fin=None):
+   """Applique les filtres de statut et de période directement dans la requête SQL."""
+   if status is not None:
+      query = query.filter(Commande.status == status)
+   if date_debut is not None:
+      query = query.filter(Commande.date_creation >= date_debut)
+   if date_fin is not None:
+      query = query.filter(Commande.date_creation <= date_fin)
+   return query
+
+##===============================================================##
+##        Récupérer les détails d'une commande spécifique.       ##
+##===============================================================##
+@router.get("/commandes/{commande_id}", response_model=schemas.CommandeDetailResponse, tags=["Commandes"])
+async def get_commande_details(
+   commande_id: int,
+   db: AsyncSession = Depends(get_async_db),
+   current_user: UserResponse = Depends(get_current_user)
+):
+   """
+   Endpoint pour récupérer les détails d'une commande spécifique.
+   """
+   # Récupérer la commande avec son client et ses lignes
+   result = await db.execute(
+      select(Commande)
+      .options(
+         joinedload(Commande.client),
+         selectinload(Commande.lignecommande)
+      )
+      .where(Commande.id == commande_id)
+   )
+   commande = result.scalars().first()
+    
+   if not commande:
+      raise HTTPException(
+         status_code=status.HTTP_404_NOT_FOUND,
+         detail="Commande non trouvée"
+      )
+    
+   return _serialiser_commande_detail(commande)
 ##===============================================================##
 ##        Récupérer les commandes d'une agence spécifique        ##
 ##===============================================================##
-@router.get("/commandes/agence/{agence_id}", response_model=List[schemas.CommandeDetailResponse], tags=["Commandes"])
-def get_commandes_agence(
+@router.get("/commandes/agence/{agence_id}", response_model=schemas.CommandeDetailPage, tags=["Commandes"])
+async def get_commandes_agence(
     agence_id: int,
-    db: Session = Depends(get_db)
+    filtres: dict = Depends(filtres_commandes),
+    limit: int = Query(LIMITE_PAR_DEFAUT, ge=1, le=LIMITE_MAX),
+    cursor: Optional[str] = Query(None, description="Curseur retourné par la page précédente"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Endpoint pour récupérer toutes les commandes d'une agence avec leurs détails.
+    Endpoint pour récupérer les commandes d'une agence avec leurs détails,
+    de la plus récente à la plus ancienne.
+    Le client est chargé par jointure et les lignes en un seul SELECT ... IN,
+    soit un nombre constant de requêtes quel que soit le nombre de commandes.
     """
-    commandes = db.query(Commande).filter(Commande.agence_id == agence_id).all()
-    
-    if not commandes:
-        return []
-    
-    result = []
-    for commande in commandes:
-        # Récupérer les informations du client
-        client = db.query(Client).filter(Client.id == commande.client_id).first()
-        
-        # Récupérer les lignes de commande
-        lignes = db.query(LigneCommande).filter(LigneCommande.commande_id == commande.id).all()
-        
-        # Construire l'objet de réponse
-        commande_detail = {
-            "id": commande.id,
-            "client_id": commande.client_id,
-            "client_nom": f"{client.prenom} {client.nom}" if client else "Client inconnu",
-            "client_telephone": client.telephone if client else "",
-            "client_adresse": client.adresse if client else "",
-            "agence_id": commande.agence_id,
-            "createur_id": commande.createur_id,
-            "recepteur_id": commande.recepteur_id,
-            "date_creation": commande.date_creation,
-            "date_reception": commande.date_reception,
-            "statut": commande.status,
-            "montant_total": commande.montant_total,
-            "notes": commande.notes,
-            "lignes_commande": [
-                {
-                    "id": ligne.id,
-                    "nom_article": ligne.nom_article,
-                    "reference_article": ligne.reference_article,
-                    "quantite": ligne.quantite,
-                    "prix_unitaire": ligne.prix_unitaire,
-                    "sous_total": ligne.sous_totaux
-                } for ligne in lignes
-            ]
-        }
-        result.append(commande_detail)
+    cle = (Commande.date_creation, Commande.id)
+    query = _filtrer_commandes(
+        select(Commande).where(Commande.agence_id == agence_id),
+        **filtres
+    )
+    result = await db.execute(
+        requete_page(
+            query.options(
+                joinedload(Commande.client),
+                selectinload(Commande.lignecommande)
+            ),
+            cle,
+            cursor,
+            limit,
+            descendant=True
+        )
+    )
+    commandes, next_cursor = decouper_page(result.scalars().all(), cle, limit)
     
-    return result
+    # Dictionnaires construits ici : encodés directement, sans revalidation
+    return reponse_json({
+        "items": [_serialiser_commande_detail(commande) for commande in commandes],
+        "next_cursor": next_cursor
+    })
+##===============================================================##
+##     Synchronisation incrémentale des commandes d'une agence   ##
+##===============================================================##
+# updated_at est fixé par l'API au flush, avant le commit : une transaction
+# lente peut valider une valeur plus ancienne qu'une commande déjà servie.
+# Seules les commandes modifiées depuis plus de cette marge sont servies.
+MARGE_CHANGEMENTS = timedelta(seconds=float(os.getenv("CHANGES_SAFETY_MARGIN_SECONDS", "5")))
+
+@router.get("/commandes/agence/{agence_id}/changes", response_model=schemas.CommandeChanges, tags=["Commandes"])
+async def get_changements_commandes_agence(
+    agence_id: int,
+    since: Optional[str] = Query(None, description="Watermark retourné par la synchronisation précédente"),
+    limit: int = Query(LIMITE_PAR_DEFAUT, ge=1, le=LIMITE_MAX),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Endpoint de synchronisation des tablettes : retourne uniquement les
+    commandes créées ou modifiées après le watermark `since` (toutes si absent),
+    de la plus ancienne à la plus récente modification, avec le nouveau watermark.
+    Si `has_more` est vrai, la tablette rappelle immédiatement avec ce watermark.
+
+    Le watermark porte (updated_at, id) : des commandes écrites dans la même
+    microseconde ne sont pas perdues en limite de page. Les commandes modifiées
+    depuis moins de MARGE_CHANGEMENTS ne sont servies qu'à l'appel suivant : une
+    écriture validée plus lentement que cette marge peut encore être sautée.
+    """
+    cle = (Commande.updated_at, Commande.id)
+    limite_stable = datetime.utcnow() - MARGE_CHANGEMENTS
+    result = await db.execute(
+        requete_page(
+            select(Commande).where(
+                Commande.agence_id == agence_id,
+                Commande.updated_at < limite_stable
+            ).options(
+                joinedload(Commande.client),
+                selectinload(Commande.lignecommande)
+            ),
+            cle,
+            since,
+            limit
+        )
+    )
+    commandes = result.scalars().all()
+    has_more = len(commandes) > limit
+    commandes = commandes[:limit]
+
+    # Sans changement, le watermark reste celui de la tablette : on ne
+    # l'avance jamais à l'heure du serveur pour ne pas sauter une écriture
+    # encore en cours de validation
+    watermark = since
+    if commandes:
+        watermark = encoder_curseur([getattr(commandes[-1], colonne.key) for colonne in cle])
+
+    return reponse_json({
+        "items": [_serialiser_commande_detail(commande) for commande in commandes],
+        "watermark": watermark,
+        "has_more": has_more
+    })
 ##===============================================================##
 ##         commandes créées par un utilisateur spécifique      ##
 ##===============================================================##
-@router.get("/utilisateurs/{user_id}/commandes", response_model=List[schemas.CommandeDetailResponse], tags=["Commandes"])
+@router.get("/utilisateurs/{user_id}/commandes", response_model=schemas.CommandeDetailPage, tags=["Commandes"])
 def get_commandes_utilisateur(
     user_id: int,
+    filtres: dict = Depends(filtres_commandes),
+    limit: int = Query(LIMITE_PAR_DEFAUT, ge=1, le=LIMITE_MAX),
+    cursor: Optional[str] = Query(None, description="Curseur retourné par la page précédente"),
     db: Session = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
     """
-    Endpoint pour récupérer toutes les commandes créées par un utilisateur spécifique.
+    Endpoint pour récupérer les commandes créées par un utilisateur spécifique,
+    de la plus récente à la plus ancienne.
     """
     # Vérifier si l'utilisateur existe
     user = db.query(User).filter(User.id == user_id).first()
@@ -574,53 +747,27 @@ def get_commandes_utilisateur(
             detail="Utilisateur non trouvé"
         )
     
-    # Récupérer les commandes créées par cet utilisateur
-    commandes = db.query(Commande).filter(Commande.createur_id == user_id).all()
-    
-    if not commandes:
-        return []
-    
-    result = []
-    for commande in commandes:
-        # Récupérer les informations du client
-        client = db.query(Client).filter(Client.id == commande.client_id).first()
-        
-        # Récupérer les informations du récepteur (utilisateur qui a reçu la commande)
-        recepteur = db.query(User).filter(User.id == commande.recepteur_id).first()
-        
-        # Récupérer les lignes de commande
-        lignes = db.query(LigneCommande).filter(LigneCommande.commande_id == commande.id).all()
-        
-        # Construire l'objet de réponse
-        commande_detail = {
-            "id": commande.id,
-            "client_id": commande.client_id,
-            "client_nom": f"{client.prenom} {client.nom}" if client else "Client inconnu",
-            "client_telephone": client.telephone if client else "",
-            "client_adresse": client.adresse if client else "",
-            "agence_id": commande.agence_id,
-            "createur_id": commande.createur_id,
-            "recepteur_id": commande.recepteur_id,
-            "recepteur_nom": f"{recepteur.prenom} {recepteur.nom}" if recepteur else None,
-            "date_creation": commande.date_creation,
-            "date_reception": commande.date_reception,
-            "statut": commande.status,
-            "montant_total": commande.montant_total,
-            "notes": commande.notes,
-            "lignes_commande": [
-                {
-                    "id": ligne.id,
-                    "nom_article": ligne.nom_article,
-                    "reference_article": ligne.reference_article,
-                    "quantite": ligne.quantite,
-                    "prix_unitaire": ligne.prix_unitaire,
-                    "sous_total": ligne.sous_totaux
-                } for ligne in lignes
-            ]
-        }
-        result.append(commande_detail)
+    # Récupérer une page de commandes créées par cet utilisateur
+    query = _filtrer_commandes(
+        db.query(Commande).filter(Commande.createur_id == user_id),
+        **filtres
+    )
+    commandes, next_cursor = paginer(
+        query.options(
+            joinedload(Commande.client),
+            selectinload(Commande.lignecommande)
+        ),
+        (Commande.date_creation, Commande.id),
+        cursor,
+        limit,
+        descendant=True
+    )
     
-    return result
+    # Dictionnaires construits ici : encodés directement, sans revalidation
+    return reponse_json({
+        "items": [_serialiser_commande_detail(commande) for commande in commandes],
+        "next_cursor": next_cursor
+    })
 
 ##===============================================================##
 ##           Update pour le status de la commande                ##
@@ -630,40 +777,85 @@ async def update_order_status(
    commande_id: int, 
    status: str = Query(..., description="Nouveau statut de la commande"), 
    current_user: UserResponse = Depends(get_current_user),
-   db: Session = Depends(get_db)
+   db: AsyncSession = Depends(get_async_db)
 ):
    """
    Endpoint pour mettre à jour le statut d'une commande.
    """
-   # Récupérer la commande
-   commande = db.query(Commande).filter(Commande.id == commande_id).first()
+   # Récupérer la commande, verrouillée jusqu'au commit (ancien statut du cumul)
+   commande = await db.get(Commande, commande_id, with_for_update=True)
    
    if not commande:
       raise HTTPException(status_code=404, detail="Commande non trouvée")
    
    # Mettre à jour le statut
+   ancien_status = commande.status
    commande.status = status
    
    # Si la commande vient d'être reçue, mettre à jour la date de réception
    if status == "reçue" and not commande.date_reception:
       commande.date_reception = datetime.utcnow()
+
+   # Déplacer la commande dans le cumul journalier de l'agence
+   for requete in rollup.requetes_changement_statut(nom_dialecte(db), commande, ancien_status):
+      await db.execute(requete)
    
-   # Enregistrer les modifications
-   db.commit()
-   db.refresh(commande)
+   # Notification de la mise à jour, validée avec le changement de statut
+   outbox.ajouter(
+      db,
+      agence_id=commande.agence_id,
+      titre="Mise à jour de commande",
+      corps=f"La commande #{commande.id} est maintenant: {status}",
+      donnees={
+         "commande_id": str(commande.id),
+         "type": "mise_a_jour_statut",
+         "agence_id": str(commande.agence_id),
+         "statut": status
+      }
+   )
    
-   # Envoyer la notification
-   if notification_service:
-      success = await notification_service.notifier_mise_a_jour_statut(
-          commande.agence_id, 
-          commande.id, 
-          status
-      )
-      if not success:
-          logger.warning(f"Échec de l'envoi de la notification pour la commande {commande_id}")
+   # Enregistrer les modifications
+   await db.commit()
+   relais_outbox.signaler()
+   _publier_mise_a_jour(commande)
    
    return {"success": True, "message": f"Statut mis à jour: {status}", "commande_id": commande_id}
 
+def _publier_mise_a_jour(commande):
+   """Diffuse le nouvel état d'une commande aux flux SSE de son agence."""
+   order_events.publier(commande.agence_id, "mise_a_jour_statut", {
+      "commande_id": commande.id,
+      "statut": commande.status,
+      "recepteur_id": commande.recepteur_id,
+      "date_reception": commande.date_reception
+   })
+
+##===============================================================##
+##        Flux temps réel des commandes d'une agence (SSE)       ##
+##===============================================================##
+@router.get("/agences/{agence_id}/commandes/stream", tags=["Commandes"])
+async def stream_commandes_agence(
+   agence_id: int,
+   request: Request,
+   last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+   """
+   Flux Server-Sent Events des commandes nouvelles ou modifiées d'une agence.
+   Le navigateur/la tablette renvoie Last-Event-ID à la reconnexion pour
+   recevoir les événements manqués ; un événement `resync` demande de
+   recharger la liste lorsqu'ils ne sont plus disponibles.
+   """
+   try:
+      dernier_id = int(last_event_id) if last_event_id else None
+   except ValueError:
+      raise HTTPException(status_code=400, detail="Last-Event-ID invalide")
+
+   return StreamingResponse(
+      flux_sse(request, agence_id, dernier_id),
+      media_type="text/event-stream",
+      headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+   )
+
 
 ##===============================================================##
 ##             Creation et mise jour du tablette                 ##
@@ -687,16 +879,19 @@ def configurer_tablette(
       tablette_existante.agence_id = config.agence_id
       tablette_existante.est_active = True
       tablette_existante.derniere_syncro = datetime.now()
+      tablette = tablette_existante
    else:
       # Créer une nouvelle entrée de tablette
-      nouvelle_tablette = Tablette(
+      tablette = Tablette(
          numero_serie=config.numero_serie,
          agence_id=config.agence_id,
          est_active=True,
          derniere_syncro=datetime.now()
       )
-      db.add(nouvelle_tablette)
-      db.commit()
+      db.add(tablette)
+   db.commit()
+   presence_tablettes.charger(tablette)
+   tablettes_reponses.invalider()
     
    return {"success": True, "message": "Tablette configurée avec succès"}
 
@@ -705,44 +900,58 @@ def configurer_tablette(
 ##             Vérification du statut de la tablette             ##
 ##===============================================================##
 @router.get("/tablettes/verifier/{numero_serie}", tags=["Tablette"])
-def verifier_tablette(
+async def verifier_tablette(
    numero_serie: str,
-   db: Session = Depends(get_db)
+   db: AsyncSession = Depends(get_async_db)
 ):
    """ 
    Endpoint pour vérifier le statut d'une tablette par son numéro de série.
+   Le statut est servi depuis la carte de présence ; la date de
+   synchronisation est écrite en base par lot (voir presence.py).
    """
+   etat = presence_tablettes.get(numero_serie)
+   if etat is None:
+      result = await db.execute(select(Tablette).where(Tablette.numero_serie == numero_serie))
+      tablette = result.scalars().first()
+
+      if not tablette:
+         raise HTTPException(status_code=404, detail="Tablette non trouvée")
+      etat = presence_tablettes.charger(tablette)
    
-   tablette = db.query(Tablette).filter(Tablette.numero_serie == numero_serie).first()
-   
-   if not tablette:
-      raise HTTPException(status_code=404, detail="Tablette non trouvée")
-   
-   # Mettre à jour la date de synchronisation
-   tablette.derniere_syncro = datetime.utcnow()
-   db.commit()
+   # Noter la synchronisation, sans commit
+   presence_tablettes.battement(etat)
    
    return {
-       "est_active": tablette.est_active,
-       "agence_id": tablette.agence_id,
-       "derniere_syncro": tablette.derniere_syncro
+       "est_active": etat.est_active,
+       "agence_id": etat.agence_id,
+       "derniere_syncro": etat.derniere_syncro
    }
    
    
 ##===============================================================##
 ##             Récupération de la liste des tablettes            ##
 ##===============================================================##
-@router.get("/tablettes", response_model=List[schemas.TabletteResponse], tags=["Tablette"])
+@router.get("/tablettes", response_model=schemas.TablettePage, tags=["Tablette"])
 def get_tablettes(
+    request: Request,
+    limit: int = Query(LIMITE_PAR_DEFAUT, ge=1, le=LIMITE_MAX),
+    cursor: Optional[str] = Query(None, description="Curseur retourné par la page précédente"),
     db : Session = Depends(get_db),
 ) :
    
     """
-    Endpoint pour récupérer la liste de toutes les tablettes.
+    Endpoint pour récupérer la liste des tablettes, page par page.
+    Réponse servie depuis le cache avec un ETag (304 si If-None-Match correspond).
     """
-    tablettes = db.query(Tablette).all()
+    entree = tablettes_reponses.get((limit, cursor))
+    if entree is None:
+        tablettes, next_cursor = paginer(db.query(Tablette), (Tablette.id,), cursor, limit)
+        entree = tablettes_reponses.enregistrer(
+            (limit, cursor),
+            schemas.TablettePage.model_validate({"items": tablettes, "next_cursor": next_cursor}, from_attributes=True)
+        )
     
-    return tablettes
+    return reponse_conditionnelle(request, entree)
  
 ##===============================================================##
 ##            Endpoint pour desactiver une tablette              ##
@@ -763,6 +972,8 @@ def desactiver_tablette(
     
    tablette.est_active = False
    db.commit()
+   presence_tablettes.charger(tablette)
+   tablettes_reponses.invalider()
     
    return {"success": True, "message": "Tablette désactivée avec succès"}
 
@@ -826,20 +1037,12 @@ def update_commandes_crees(
    current_user: UserResponse = Depends(get_current_user), 
    db: Session = Depends(get_db)
 ):
-
-   session = db.query(UserSession).filter(UserSession.id == session_id).first()
-
-   if not session:
-      raise HTTPException(status_code=404, detail="Session non trouvée")
-    
-   user = db.query(User).filter(User.id == session.user_id).first()
-   if user.role != "agent_call_center":
-      raise HTTPException(status_code=400, detail="Seuls les agents call center peuvent créer des commandes")
-    
-   session.nombre_commande_creer += 1
-   db.commit()
+   valeur = _incrementer_compteur_session(
+      db, session_id, "nombre_commande_creer", "agent_call_center",
+      "Seuls les agents call center peuvent créer des commandes"
+   )
     
-   return {"message": "Compteur de commandes créées mis à jour"}
+   return {"message": "Compteur de commandes créées mis à jour", "nombre_commande_creer": valeur}
 
 ##===============================================================##
 ##            Compteur de commandes créées mis à jour            ##
@@ -850,21 +1053,32 @@ def update_commandes_traitees(
    current_user: UserResponse = Depends(get_current_user), 
    db: Session = Depends(get_db)
 ):
+   valeur = _incrementer_compteur_session(
+      db, session_id, "nombre_commande_traiter", "agent_restaurant",
+      "Seuls les agents restaurant peuvent traiter des commandes"
+   )
+    
+   return {"message": "Compteur de commandes traitées mis à jour", "nombre_commande_traiter": valeur}
 
-   session = db.query(UserSession).filter(UserSession.id == session_id).first()
+def _incrementer_compteur_session(db, session_id, colonne, role, detail_role):
+   """
+   Incrémente un compteur de session en une requête atomique, ou le cumule en
+   mémoire si SESSION_COUNTERS_BUFFERED est actif et que la session a déjà été
+   vérifiée. Retourne la nouvelle valeur (None si cumulée, écrite plus tard).
+   """
+   if compteurs_sessions.actif and compteurs_sessions.autorisee(session_id, role):
+      compteurs_sessions.ajouter(session_id, colonne)
+      return None
 
-   if not session:
-      raise HTTPException(status_code=404, detail="Session non trouvée")
-    
-   user = db.query(User).filter(User.id == session.user_id).first()
+   valeur = incrementer_compteur(db, session_id, colonne, role)
+   if valeur is None:
+      # Aucune ligne modifiée : session absente ou mauvais rôle
+      if db.query(UserSession.id).filter(UserSession.id == session_id).first() is None:
+         raise HTTPException(status_code=404, detail="Session non trouvée")
+      raise HTTPException(status_code=400, detail=detail_role)
 
-   if user.role != "agent_restaurant":
-      raise HTTPException(status_code=400, detail="Seuls les agents restaurant peuvent traiter des commandes")
-    
-   session.nombre_commande_traiter += 1
-   db.commit()
-    
-   return {"message": "Compteur de commandes traitées mis à jour"}
+   compteurs_sessions.autoriser(session_id, role)
+   return valeur
  
 ##===============================================================##
 ##            Enregistrer un token FCM pour une tablette         ##
@@ -933,3 +1147,105 @@ async def unregister_token(
          raise HTTPException(status_code=500, detail="Échec de la désinscription du token")
    else:
       raise HTTPException(status_code=503, detail="Service de notification non disponible")
+
+##===============================================================================##
+##                                 MONITORING                                    ##
+##===============================================================================##
+##===============================================================##
+##         Rapport journalier des commandes par agence           ##
+##===============================================================##
+@router.get("/rapports/agences", response_model=List[schemas.RapportAgenceJour], tags=["Rapports"])
+async def get_rapport_agences(
+   date_debut: Optional[date] = Query(None, description="Premier jour inclus (défaut : 30 jours avant date_fin)"),
+   date_fin: Optional[date] = Query(None, description="Dernier jour inclus (défaut : aujourd'hui, UTC)"),
+   agence_id: Optional[int] = Query(None),
+   current_user: UserResponse = Depends(role_required(["admin"])),
+   db: AsyncSession = Depends(get_async_db)
+):
+   """
+   Endpoint retournant, par agence et par jour, le nombre de commandes et le
+   chiffre d'affaires, au total et par statut.
+   Lit uniquement la table de cumul : le coût dépend du nombre de jours
+   demandés, pas du nombre de commandes en base.
+   """
+   date_fin = date_fin or datetime.utcnow().date()
+   date_debut = date_debut or date_fin - timedelta(days=30)
+
+   query = select(StatistiqueAgenceJour).where(
+      StatistiqueAgenceJour.jour >= date_debut,
+      StatistiqueAgenceJour.jour <= date_fin,
+      StatistiqueAgenceJour.nombre_commandes > 0
+   )
+   if agence_id is not None:
+      query = query.where(StatistiqueAgenceJour.agence_id == agence_id)
+   result = await db.execute(
+      query.order_by(StatistiqueAgenceJour.jour.desc(), StatistiqueAgenceJour.agence_id)
+   )
+
+   rapports = {}
+   for cumul in result.scalars():
+      rapport = rapports.setdefault((cumul.agence_id, cumul.jour), {
+         "agence_id": cumul.agence_id,
+         "jour": cumul.jour,
+         "nombre_commandes": 0,
+         "montant_total": 0,
+         "par_statut": {}
+      })
+      rapport["nombre_commandes"] += cumul.nombre_commandes
+      rapport["montant_total"] += cumul.montant_total
+      rapport["par_statut"][cumul.status] = {
+         "nombre_commandes": cumul.nombre_commandes,
+         "montant_total": cumul.montant_total
+      }
+   return list(rapports.values())
+
+##===============================================================##
+##           Export des commandes (NDJSON ou CSV)                ##
+##===============================================================##
+@router.get("/exports/commandes", tags=["Exports"])
+async def exporter_commandes(
+   agence_id: Optional[int] = Query(None),
+   date_debut: Optional[datetime] = Query(None, alias="from", description="Date de création minimale incluse"),
+   date_fin: Optional[datetime] = Query(None, alias="to", description="Date de création maximale incluse"),
+   format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+   current_user: UserResponse = Depends(role_required(["admin"]))
+):
+   """
+   Endpoint d'export des commandes pour la comptabilité, lignes comprises,
+   de la plus ancienne à la plus récente.
+   NDJSON : une commande par ligne ; CSV : une ligne par ligne de commande.
+   Les commandes sont lues et envoyées par lots : la mémoire reste constante
+   quel que soit le volume exporté.
+   """
+   return StreamingResponse(
+      flux_export(format, _serialiser_commande_detail, agence_id, date_debut, date_fin),
+      media_type=FORMATS_EXPORT[format],
+      headers={"Content-Disposition": f'attachment; filename="commandes.{format}"'}
+   )
+
+##===============================================================##
+##            Métriques internes de l'API                        ##
+##===============================================================##
+@router.get("/metrics", tags=["Monitoring"])
+async def get_metrics():
+   """
+   Endpoint exposant les métriques internes du processus (outbox des notifications, ...).
+   """
+   return {
+      "outbox": await relais_outbox.statistiques(),
+      "demarrage": chrono_demarrage.rapport(),
+      "evenements": order_events.statistiques(),
+      "presence_tablettes": presence_tablettes.statistiques(),
+      "compteurs_sessions": compteurs_sessions.statistiques(),
+      "maintenance_jetons": maintenance_jetons.statistiques(),
+      "caches": {nom: cache.statistiques() for nom, cache in caches.items()},
+      "bcrypt": {
+         **statistiques_bcrypt(),
+         "workers": BCRYPT_WORKERS,
+         "max_en_attente": BCRYPT_MAX_PENDING
+      },
+      "database": {
+         "sync": statistiques_pool(engine),
+         "async": statistiques_pool(async_engine.sync_engine)
+      }
+   }
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
 import re
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Dict, List, Optional
 
 
 
@@ -238,4 +238,42 @@ class SessionBase(BaseModel):
 class FirebaseTokenRegister(BaseModel):
     token: str
 
+##===============================================================##
+##                 Schema pour la pagination                     ##
+##===============================================================##
+# Pages retournées par les endpoints de liste (pagination par curseur)
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None
+
+class AgencePage(BaseModel):
+    items: List[AgenceResponse]
+    next_cursor: Optional[str] = None
+
+class TablettePage(BaseModel):
+    items: List[TabletteResponse]
+    next_cursor: Optional[str] = None
+
+class CommandeDetailPage(BaseModel):
+    items: List[CommandeDetailResponse]
+    next_cursor: Optional[str] = None
+
+# Réponse de la synchronisation incrémentale d'une agence
+class CommandeChanges(BaseModel):
+    items: List[CommandeDetailResponse]
+    watermark: Optional[str] = None
+    has_more: bool = False
 
+##===============================================================##
+##                 Schema pour les rapports                      ##
+##===============================================================##
+class CumulStatut(BaseModel):
+    nombre_commandes: int
+    montant_total: int
+
+class RapportAgenceJour(BaseModel):
+    agence_id: int
+    jour: date
+    nombre_commandes: int
+    montant_total: int
+    par_statut: Dict[str, CumulStatut]
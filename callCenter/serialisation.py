@@ -0,0 +1,24 @@
+import os
+from typing import Any
+
+import orjson
+from fastapi import Response
+
+# Sérialisation directe des grandes listes ; désactivable pour comparer avec
+# le chemin FastAPI standard (validation response_model puis json)
+JSON_RAPIDE = os.getenv("FAST_JSON_RESPONSES", "true").lower() in ("1", "true", "yes", "oui")
+
+
+def reponse_json(contenu: Any):
+    """
+    Encode en octets, avec orjson, un contenu construit par l'API elle-même
+    (dictionnaires de types simples et datetime), sans revalidation contre le
+    response_model de l'endpoint. Le response_model reste déclaré pour le
+    schéma OpenAPI.
+
+    Le contenu doit déjà avoir exactement la forme du schéma déclaré : ce
+    chemin ne filtre ni ne convertit aucun champ.
+    """
+    if not JSON_RAPIDE:
+        return contenu
+    return Response(content=orjson.dumps(contenu), media_type="application/json")
@@ -1,26 +1,149 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import os
+import threading
+import time
 
 
 # URL de connexion à PostgreSQL
 # Remplacez les valeurs par vos informations de connexion
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL_RFC_CALL")
 
+# Drivers async utilisés pour chaque base
+DRIVERS_ASYNC = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def url_async(url: str) -> str:
+    """Convertit l'URL sync (psycopg2, pysqlite) en URL du driver async équivalent."""
+    url = make_url(url)
+    return url.set(drivername=DRIVERS_ASYNC.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+class _MesureAttente:
+    """Mesure le temps passé à obtenir une connexion du pool."""
+
+    def __init__(self, *args, max_overflow: int = 10, **kwargs):
+        super().__init__(*args, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+        # _do_get est appelé en parallèle par les threads du threadpool
+        self._verrou_mesures = threading.Lock()
+        self.expirations = 0
+        self.nombre_attentes = 0
+        self.attente_totale = 0.0
+        self.attente_max = 0.0
+
+    def _do_get(self):
+        debut = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._verrou_mesures:
+                self.expirations += 1
+            raise
+        finally:
+            attente = time.perf_counter() - debut
+            with self._verrou_mesures:
+                self.nombre_attentes += 1
+                self.attente_totale += attente
+                self.attente_max = max(self.attente_max, attente)
+
+    def mesures(self) -> dict:
+        """Copie cohérente des compteurs d'attente."""
+        with self._verrou_mesures:
+            return {
+                "expirations": self.expirations,
+                "nombre_attentes": self.nombre_attentes,
+                "attente_totale": self.attente_totale,
+                "attente_max": self.attente_max,
+            }
+
+class PoolInstrumente(_MesureAttente, QueuePool):
+    """QueuePool exposant le temps d'attente des connexions."""
+
+class PoolAsyncInstrumente(_MesureAttente, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool exposant le temps d'attente des connexions."""
+
+def _env_bool(nom: str, defaut: str) -> bool:
+    return os.getenv(nom, defaut).lower() in ("1", "true", "yes", "oui")
+
+def options_pool(url: str, poolclass) -> dict:
+    """
+    Options du pool de connexions, réglables par variables d'environnement :
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (s), DB_POOL_RECYCLE (s)
+    et DB_POOL_PRE_PING. Les bases SQLite en mémoire gardent le pool par défaut.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", "true"),
+    }
+
+def statistiques_pool(moteur) -> dict:
+    """Connexions empruntées, débordement et temps d'attente du pool d'un moteur."""
+    pool = moteur.pool
+    if not isinstance(pool, _MesureAttente):
+        return {"pool": type(pool).__name__}
+    mesures = pool.mesures()
+    nombre_attentes = mesures["nombre_attentes"]
+    return {
+        "pool": type(pool).__name__,
+        "taille": pool.size(),
+        "max_overflow": pool.max_overflow,
+        "empruntees": pool.checkedout(),
+        "disponibles": pool.checkedin(),
+        "debordement": max(pool.overflow(), 0),
+        "expirations": mesures["expirations"],
+        "attentes": nombre_attentes,
+        "attente_moyenne_ms": round(mesures["attente_totale"] / nombre_attentes * 1000, 3) if nombre_attentes else None,
+        "attente_max_ms": round(mesures["attente_max"] * 1000, 3),
+    }
+
 # Créer un moteur de connexion
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **options_pool(SQLALCHEMY_DATABASE_URL, PoolInstrumente))
+
+# Moteur async pour les endpoints `async def` : une requête en attente de la
+# base ne bloque ni la boucle ni un thread du threadpool
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL_RFC_CALL") or url_async(SQLALCHEMY_DATABASE_URL)
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    **options_pool(SQLALCHEMY_ASYNC_DATABASE_URL, PoolAsyncInstrumente)
+)
 
 # Créer une session locale pour interagir avec la base de données
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sessions async ; les objets restent lisibles après le commit (pas de
+# rechargement implicite, interdit en async)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Déclarer la base pour les modèles
 Base = declarative_base()
 
+def nom_dialecte(db) -> str:
+    """Nom du dialecte d'une session sync ou async ("postgresql", "sqlite", ...)."""
+    return db.get_bind().dialect.name
+
 # Fonction pour obtenir une session de base de données
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Fonction pour obtenir une session async de base de données
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,73 @@
+"""
+Chronométrage du démarrage de l'API, phase par phase.
+
+main.py mesure ses imports et la construction de l'application, le lifespan
+mesure le démarrage des services ; le rapport est journalisé une fois l'API
+prête et exposé par /metrics. Pour le détail module par module :
+
+    python -X importtime -c "import main" 2> importtime.log
+    python demarrage.py
+"""
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ChronoDemarrage:
+    """Durées des phases de démarrage, mesurées depuis l'import de ce module."""
+
+    def __init__(self):
+        self.origine = time.perf_counter()
+        self._phases: List[Tuple[str, float]] = []
+        self.pret_en: Optional[float] = None
+
+    @contextmanager
+    def phase(self, nom: str):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases.append((nom, time.perf_counter() - debut))
+
+    def pret(self) -> Dict[str, Any]:
+        """Marque l'API prête à servir et journalise le rapport."""
+        # Importé ici : ce module est importé avant tout autre par main.py
+        from logger import logger
+
+        self.pret_en = time.perf_counter() - self.origine
+        rapport = self.rapport()
+        logger.info(
+            f"API prête en {rapport['total_ms']} ms : "
+            + ", ".join(f"{nom} {duree} ms" for nom, duree in rapport["phases"].items())
+        )
+        return rapport
+
+    def rapport(self) -> Dict[str, Any]:
+        total = self.pret_en if self.pret_en is not None else time.perf_counter() - self.origine
+        return {
+            "phases": {nom: round(duree * 1000, 1) for nom, duree in self._phases},
+            "total_ms": round(total * 1000, 1),
+            "pret": self.pret_en is not None,
+        }
+
+
+# Instance singleton, importée en premier par main.py
+chrono_demarrage = ChronoDemarrage()
+
+
+if __name__ == "__main__":
+    import asyncio
+    import json
+
+    # Le module exécuté ici est __main__ : le chrono rempli par main.py est
+    # celui du module `demarrage` qu'il importe
+    import main
+    from demarrage import chrono_demarrage as chrono
+
+    async def _cycle():
+        async with main.lifespan(main.app):
+            pass
+
+    # Démarre puis arrête les services, comme un worker qui redémarre
+    asyncio.run(_cycle())
+    print(json.dumps(chrono.rapport(), indent=2))
@@ -0,0 +1,63 @@
+"""
+Initialisation du schéma de la base (SQLALCHEMY_DATABASE_URL_RFC_CALL).
+
+La chaîne Alembic part d'un schéma existant : sa première révision modifie la
+table users et aucune ne crée les tables de base. Une base vide est donc créée
+depuis les modèles puis marquée à la dernière révision (`alembic stamp head`) ;
+une base déjà versionnée est migrée (`alembic upgrade head`).
+
+À exécuter avant le premier démarrage de l'API et à chaque déploiement :
+
+    python initialiser_base.py
+"""
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from database import SQLALCHEMY_DATABASE_URL, Base, engine
+import models  # noqa: F401  (tables de Base.metadata)
+
+RACINE = os.path.dirname(os.path.abspath(__file__))
+
+
+def configuration_alembic() -> Config:
+    """alembic.ini, pointé sur la base de l'API plutôt que sur l'URL qu'il contient."""
+    config = Config(os.path.join(RACINE, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(RACINE, "alembic"))
+    # set_main_option interprète les % (interpolation de configparser)
+    config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.replace("%", "%%"))
+    return config
+
+
+def initialiser() -> str:
+    """Crée ou migre le schéma ; retourne l'opération effectuée."""
+    config = configuration_alembic()
+    tables = inspect(engine).get_table_names()
+    if not tables:
+        Base.metadata.create_all(bind=engine)
+        command.stamp(config, "head")
+        return "creee"
+    if "alembic_version" not in tables:
+        raise RuntimeError(
+            "Tables existantes sans table alembic_version : marquer la révision "
+            "correspondant au schéma avec `alembic stamp <révision>` puis relancer"
+        )
+    command.upgrade(config, "head")
+    return "migree"
+
+
+def main():
+    try:
+        operation = initialiser()
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+    print("Base créée depuis les modèles et marquée à la dernière révision" if operation == "creee"
+          else "Base migrée à la dernière révision")
+
+
+if __name__ == "__main__":
+    main()
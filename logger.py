@@ -1,7 +1,11 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, timezone
 
 # Créer le dossier des logs s'il n'existe pas
 os.makedirs("logs", exist_ok=True)
@@ -10,14 +14,49 @@ os.makedirs("logs", exist_ok=True)
 logger = logging.getLogger("rfc_callcenter_api")
 logger.setLevel(logging.INFO)
 
+
+class JsonFormatter(logging.Formatter):
+    """Formate chaque enregistrement en une ligne JSON."""
+
+    def format(self, record):
+        donnees = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "niveau": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # Champs structurés passés via extra={"http": {...}}
+        if hasattr(record, "http"):
+            donnees.update(record.http)
+        if record.exc_info:
+            donnees["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            donnees["exception"] = record.exc_text
+        return json.dumps(donnees, ensure_ascii=False, default=str)
+
+
+class _EnqueueHandler(QueueHandler):
+    """
+    QueueHandler qui conserve les champs structurés de l'enregistrement :
+    seuls le message et la trace sont figés avant le passage au thread d'écriture.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
 # Format du log
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+formatter = JsonFormatter()
 
 # Handler pour la console
 console_handler = logging.StreamHandler()
-console_handler = logging.StreamHandler()
 console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
 
 # Handler pour les fichiers
 file_handler = RotatingFileHandler(
@@ -26,19 +65,31 @@ file_handler = RotatingFileHandler(
     backupCount=10
 )
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+
+# Les appels au logger ne font que déposer l'enregistrement dans une file ;
+# l'écriture console/fichier se fait dans le thread du QueueListener, hors de
+# la boucle d'événements.
+log_queue = queue.SimpleQueue()
+logger.addHandler(_EnqueueHandler(log_queue))
+log_listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 # Fonction pour créer des logs HTTP
-def log_http_request(request, response_status, execution_time=None):
+def log_http_request(request, response_status, execution_time=None, request_id=None):
+    route = request.scope.get("route")
     log_data = {
+        "request_id": request_id,
         "method": request.method,
-        "url": str(request.url),
-        "client_ip": request.client.host,
+        "route": getattr(route, "path", request.url.path),
+        "path": request.url.path,
+        "client_ip": request.client.host if request.client else None,
         "status_code": response_status,
-        "execution_time": f"{execution_time:.2f}s" if execution_time else None
+        "latency_ms": round(execution_time * 1000, 2) if execution_time is not None else None
     }
-    
+
+    message = f"HTTP {log_data['method']} {log_data['route']} - {log_data['status_code']} - {log_data['latency_ms']}ms"
     if 200 <= response_status < 400:
-        logger.info(f"HTTP {log_data['method']} {log_data['url']} - {log_data['status_code']} - {log_data['execution_time']}")
+        logger.info(message, extra={"http": log_data})
     else:
-        logger.error(f"HTTP {log_data['method']} {log_data['url']} - {log_data['status_code']} - {log_data['execution_time']}")
\ No newline at end of file
+        logger.error(message, extra={"http": log_data})
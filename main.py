@@ -1,24 +1,72 @@
-from dotenv import load_dotenv
-load_dotenv()  # Charger les variables d'environnement dès le début
-import os
-import time
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from logger import logger, log_http_request
-from callCenter.router import router as router_callCenter
-from database import Base, engine
-#from dotenv import load_dotenv
-from callCenter.notification_service import NotificationService
-from callCenter.router import notification_service
+from demarrage import chrono_demarrage
+with chrono_demarrage.phase("configuration"):
+    from dotenv import load_dotenv
+    load_dotenv()  # Charger les variables d'environnement dès le début
+    import os
+    import time
+    import uuid
+    from contextlib import asynccontextmanager
+with chrono_demarrage.phase("import_fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from logger import logger, log_http_request
+with chrono_demarrage.phase("import_modeles_et_base"):
+    # Moteurs créés sans connexion : la base est contactée au démarrage (lifespan)
+    from database import async_engine, engine
+    import models  # noqa: F401
+with chrono_demarrage.phase("import_routes"):
+    # Firebase n'est pas importé ici : le SDK est chargé et initialisé au
+    # premier envoi (callCenter/firebase_service.py)
+    from callCenter.router import router as router_callCenter
+    from callCenter.events import order_events
+    from callCenter.presence import presence_tablettes
+    from callCenter.compteurs import compteurs_sessions
+    from callCenter.jetons import maintenance_jetons
+    from callCenter.outbox import relais_outbox
 
-notification_service = NotificationService()
+# Le schéma n'est plus créé à l'import : `python initialiser_base.py` crée une
+# base vide (puis `alembic stamp head`) ou migre une base existante
 
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with chrono_demarrage.phase("connexion_base"):
+        # Ouvre une première connexion du pool ; un échec n'empêche pas le
+        # démarrage, les requêtes réessaieront
+        try:
+            async with async_engine.connect() as conn:
+                await conn.exec_driver_sql("SELECT 1")
+        except Exception as e:
+            logger.error(f"Base de données injoignable au démarrage: {str(e)}")
+    with chrono_demarrage.phase("services"):
+        # Relais de l'outbox des notifications vers FCM
+        await relais_outbox.demarrer()
+        # Écriture périodique des battements des tablettes
+        await presence_tablettes.demarrer()
+        # Écriture périodique des compteurs de session (si cumulés en mémoire)
+        await compteurs_sessions.demarrer()
+        # Resouscription et purge périodiques des tokens FCM (TOKEN_MAINTENANCE_ENABLED)
+        await maintenance_jetons.demarrer()
+    chrono_demarrage.pret()
+
+    yield
+
+    # Fermer les flux SSE pour ne pas bloquer l'arrêt du serveur
+    order_events.fermer()
+    # Les notifications non relayées restent dans l'outbox
+    await relais_outbox.arreter()
+    # Écrire les battements encore en mémoire
+    await presence_tablettes.arreter()
+    await compteurs_sessions.arreter()
+    await maintenance_jetons.arreter()
+    # Fermer les connexions des pools (celles d'aiosqlite retiennent un thread)
+    await async_engine.dispose()
+    engine.dispose()
+
 
 app = FastAPI(
+    lifespan=lifespan,
     title = "RFC Call Center API",
-    description="""
     description="""
        API pour la gestion du centre d'appel RFC.
     
@@ -54,6 +102,18 @@ app = FastAPI(
             "name": "Tablette",
             "description": "Configuration et gestion des tablettes",
         },
+        {
+            "name": "Rapports",
+            "description": "Statistiques des agences, lues depuis les cumuls journaliers",
+        },
+        {
+            "name": "Exports",
+            "description": "Exports des commandes pour la comptabilité",
+        },
+        {
+            "name": "Monitoring",
+            "description": "Métriques internes de l'API",
+        },
     ]
 )
 
@@ -73,12 +133,15 @@ app.include_router(router_callCenter)
 
 @app.middleware("http")
 async def log_requests(request, call_next):
-    start_time = time.time()
+    # Identifiant de corrélation : repris du client s'il est fourni
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    start_time = time.perf_counter()
     
     response = await call_next(request)
     
-    execution_time = time.time() - start_time
-    log_http_request(request, response.status_code, execution_time)
+    execution_time = time.perf_counter() - start_time
+    response.headers["X-Request-ID"] = request_id
+    log_http_request(request, response.status_code, execution_time, request_id)
     
     return response
 
@@ -1,6 +1,8 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, DDL, ForeignKey, Integer, JSON, String, Date, DateTime, Index, event, func
+from sqlalchemy.orm import relationship, configure_mappers, validates
 from database import Base
+from datetime import datetime
+from telephone import normaliser_telephone
 
 
 
@@ -31,7 +33,8 @@ class User(Base):
     )
     email = Column(
         String,
-        nullable=False
+        nullable=False,
+        index=True
     )
     password = Column(
         String,
@@ -85,7 +88,8 @@ class UserSession(Base):
     user_id = Column(
         Integer,
         ForeignKey('users.id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     heure_connexion = Column(
         DateTime,
@@ -199,6 +203,14 @@ class Client(Base):
         nullable=False,
         unique=True
     )
+    # Numéro sans espaces ni indicatif, clé de recherche des clients.
+    # NULL pour les doublons historiques écartés par la migration.
+    telephone_normalise = Column(
+        String,
+        nullable=True,
+        unique=True,
+        index=True
+    )
     adresse = Column(
         String,
         nullable=False,
@@ -211,11 +223,38 @@ class Client(Base):
         "Commande",
         backref = "client"
     )
+
+    @validates("telephone")
+    def _normaliser_telephone(self, key, telephone):
+        self.telephone_normalise = normaliser_telephone(telephone)
+        return telephone
+
+# Recherche par nom/prénom (callCenter/recherche.py) : index GIN pg_trgm sous
+# PostgreSQL (préfixe et similarité), B-tree sur lower(...) ailleurs
+for _colonne in ("nom", "prenom"):
+    Index(
+        f"ix_clients_{_colonne}_recherche",
+        func.lower(getattr(Client, _colonne)).label(f"{_colonne}_lower"),
+        postgresql_using="gin",
+        postgresql_ops={f"{_colonne}_lower": "gin_trgm_ops"}
+    )
+event.listen(
+    Client.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
 ##===============================================================##
 ##                           Commande                            ##
 ##===============================================================##
 class Commande(Base):
     __tablename__ = "commandes"
+    __table_args__ = (
+        # Flux des tablettes : commandes d'une agence par date / par statut
+        Index("ix_commandes_agence_id_date_creation", "agence_id", "date_creation"),
+        Index("ix_commandes_agence_id_status", "agence_id", "status"),
+        # Synchronisation incrémentale des tablettes
+        Index("ix_commandes_agence_id_updated_at", "agence_id", "updated_at"),
+    )
     id = Column(
         Integer,
         primary_key=True,
@@ -224,7 +263,8 @@ class Commande(Base):
     client_id = Column(
         Integer,
         ForeignKey('clients.id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     agence_id = Column(
         Integer,
@@ -234,7 +274,8 @@ class Commande(Base):
     createur_id = Column(
         Integer,
         ForeignKey('users.id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     recepteur_id = Column(
         Integer,
@@ -261,6 +302,13 @@ class Commande(Base):
         String,
         nullable=False
     )
+    # Date de dernière écriture, maintenue à chaque INSERT/UPDATE
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow
+    )
     lignecommande = relationship(
         "LigneCommande",
         backref = "commande"
@@ -278,7 +326,8 @@ class LigneCommande(Base):
     commande_id = Column(
         Integer,
         ForeignKey('commandes.id'),
-        nullable=False
+        nullable=False,
+        index=True
     )
     nom_article = Column(
         String,
@@ -300,6 +349,133 @@ class LigneCommande(Base):
         Integer,
         nullable=False
     )
-    
 
-   
\ No newline at end of file
+
+##===============================================================##
+##              Statistiques journalières par agence             ##
+##===============================================================##
+class StatistiqueAgenceJour(Base):
+    """
+    Cumul des commandes d'une agence par jour de création et par statut,
+    tenu à jour dans la même transaction que les commandes (voir callCenter/rollup.py).
+    """
+    __tablename__ = "statistiques_agences_jour"
+    agence_id = Column(
+        Integer,
+        ForeignKey('agences.id'),
+        primary_key=True,
+        nullable=False
+    )
+    jour = Column(
+        Date,
+        primary_key=True,
+        nullable=False
+    )
+    status = Column(
+        String,
+        primary_key=True,
+        nullable=False
+    )
+    nombre_commandes = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    montant_total = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+
+
+##===============================================================##
+##                  Outbox des notifications                     ##
+##===============================================================##
+class NotificationOutbox(Base):
+    """
+    Notification à envoyer, écrite dans la même transaction que la commande
+    qui la déclenche et relayée vers FCM par callCenter/outbox.py.
+    """
+    __tablename__ = "notification_outbox"
+    id = Column(
+        Integer,
+        primary_key=True,
+        nullable=False
+    )
+    agence_id = Column(
+        Integer,
+        ForeignKey('agences.id'),
+        nullable=False
+    )
+    titre = Column(
+        String,
+        nullable=False
+    )
+    corps = Column(
+        String,
+        nullable=False
+    )
+    # Commande et type d'événement (repris de donnees) : ordre d'envoi et fusion
+    commande_id = Column(
+        Integer,
+        nullable=True
+    )
+    type = Column(
+        String,
+        nullable=True
+    )
+    donnees = Column(
+        JSON,
+        nullable=False,
+        default=dict
+    )
+    date_creation = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow
+    )
+    # Prochaine tentative d'envoi (reculée après chaque échec)
+    prochain_essai = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow
+    )
+    tentatives = Column(
+        Integer,
+        nullable=False,
+        default=0
+    )
+    # Renseignée une fois la notification acceptée par FCM (ou abandonnée)
+    date_envoi = Column(
+        DateTime,
+        nullable=True
+    )
+    erreur = Column(
+        String,
+        nullable=True
+    )
+
+    __table_args__ = (
+        # Seules les lignes en attente sont parcourues par le relais
+        Index(
+            "ix_notification_outbox_en_attente",
+            "prochain_essai",
+            "id",
+            postgresql_where=date_envoi.is_(None),
+            sqlite_where=date_envoi.is_(None)
+        ),
+        # Notifications encore en attente d'une même commande, dans l'ordre
+        Index(
+            "ix_notification_outbox_commande_en_attente",
+            "agence_id",
+            "commande_id",
+            "id",
+            postgresql_where=date_envoi.is_(None),
+            sqlite_where=date_envoi.is_(None)
+        ),
+    )
+
+
+# Configurer les mappers dès l'import pour que les backrefs (Commande.client,
+# Commande.createur, ...) soient utilisables dans les options de chargement.
+configure_mappers()
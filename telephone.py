@@ -0,0 +1,19 @@
+import os
+import re
+
+# Indicatif du pays retiré des numéros saisis au format international
+INDICATIF_PAYS = os.getenv("PHONE_COUNTRY_CODE", "224")
+
+
+def normaliser_telephone(telephone: str) -> str:
+    """
+    Forme canonique d'un numéro : chiffres seuls, sans indicatif du pays.
+    "+224629553504", "00224 629 55 35 04" et "629553504" donnent "629553504".
+    """
+    chiffres = re.sub(r"\D", "", telephone or "")
+    if chiffres.startswith("00"):
+        chiffres = chiffres[2:]
+    # Un numéro local qui commencerait par l'indicatif reste inchangé
+    if chiffres.startswith(INDICATIF_PAYS) and len(chiffres) > 9:
+        chiffres = chiffres[len(INDICATIF_PAYS):]
+    return chiffres
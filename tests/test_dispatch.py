@@ -0,0 +1,41 @@
+# tests/test_dispatch.py
+import asyncio
+
+from callCenter.dispatch import FakeFCMTransport, FirebaseTransport, Notification
+
+
+def test_faux_transport_un_resultat_par_message():
+    transport = FakeFCMTransport(echecs=1)
+    notifications = [Notification(1, "Titre", f"Corps {i}", {"commande_id": str(i)}) for i in range(3)]
+
+    resultats = asyncio.run(transport.envoyer_lot(notifications))
+
+    # Un seul aller-retour ; l'échec simulé ne touche que le premier message
+    assert transport.lots == [3]
+    assert [resultat["success"] for resultat in resultats] == [False, True, True]
+    assert [n.corps for n in transport.envoyees] == ["Corps 1", "Corps 2"]
+
+
+def test_transport_firebase_envoie_le_lot_en_un_appel():
+    class FauxService:
+        def __init__(self):
+            self.lots = []
+
+        def send_notifications_batch(self, messages):
+            self.lots.append(messages)
+            return [{"success": True, "message_id": str(i)} for i, _ in enumerate(messages)]
+
+    service = FauxService()
+    transport = FirebaseTransport(service=service)
+    notifications = [
+        Notification(1, "Nouvelle commande !", "Commande #1", {"commande_id": "1"}),
+        Notification(2, "Mise à jour de commande", "prete", {"commande_id": "2"}),
+    ]
+
+    resultats = asyncio.run(transport.envoyer_lot(notifications))
+
+    assert len(resultats) == 2 and all(resultat["success"] for resultat in resultats)
+    assert service.lots == [[
+        {"agency_id": 1, "title": "Nouvelle commande !", "body": "Commande #1", "data": {"commande_id": "1"}},
+        {"agency_id": 2, "title": "Mise à jour de commande", "body": "prete", "data": {"commande_id": "2"}},
+    ]]
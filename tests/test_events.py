@@ -0,0 +1,73 @@
+# tests/test_events.py
+import asyncio
+from datetime import datetime
+
+from callCenter.events import OrderEventHub, flux_sse
+
+
+class _RequeteConnectee:
+    async def is_disconnected(self):
+        return False
+
+
+def test_reprise_avec_last_event_id():
+    hub = OrderEventHub(taille_historique=10)
+
+    async def scenario():
+        premier = hub.publier(1, "nouvelle_commande", {"commande_id": 1})
+        hub.publier(2, "nouvelle_commande", {"commande_id": 2})
+        troisieme = hub.publier(1, "mise_a_jour_statut", {"commande_id": 1, "statut": "reçue"})
+
+        abonnement, rattrapage, resync = hub.abonner(1, premier.id)
+        assert resync is False
+        assert [e.id for e in rattrapage] == [troisieme.id]
+
+        # Diffusion en direct aux abonnés de l'agence seulement
+        hub.publier(1, "nouvelle_commande", {"commande_id": 3})
+        hub.publier(2, "nouvelle_commande", {"commande_id": 4})
+        evenement = abonnement.file.get_nowait()
+        assert evenement.donnees == {"commande_id": 3}
+        assert abonnement.file.empty()
+
+    asyncio.run(scenario())
+
+
+def test_resynchronisation_si_historique_depasse():
+    hub = OrderEventHub(taille_historique=2)
+
+    async def scenario():
+        premier = hub.publier(1, "nouvelle_commande", {"commande_id": 1})
+        for i in range(2, 5):
+            hub.publier(1, "nouvelle_commande", {"commande_id": i})
+        _, rattrapage, resync = hub.abonner(1, premier.id)
+        assert resync is True
+        assert rattrapage == []
+
+        # Identifiant d'un processus précédent
+        _, _, resync = hub.abonner(1, 1)
+        assert resync is True
+
+    asyncio.run(scenario())
+
+
+def test_flux_sse_trames():
+    hub = OrderEventHub()
+
+    async def scenario():
+        flux = flux_sse(_RequeteConnectee(), 1, None, hub=hub, heartbeat=0.01)
+        assert await flux.__anext__() == "retry: 3000\n\n"
+        assert await flux.__anext__() == ": heartbeat\n\n"
+
+        evenement = hub.publier(1, "nouvelle_commande", {"commande_id": 7, "date_creation": datetime(2025, 4, 1, 12, 0)})
+        trame = await flux.__anext__()
+        assert trame == (
+            f"id: {evenement.id}\nevent: nouvelle_commande\n"
+            'data: {"commande_id": 7, "date_creation": "2025-04-01T12:00:00"}\n\n'
+        )
+
+        hub.fermer()
+        trames_restantes = [trame async for trame in flux]
+        assert trames_restantes == []
+        assert hub.statistiques()["flux_ouverts"] == 0
+
+    asyncio.run(scenario())
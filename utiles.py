@@ -1,8 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from jwt.exceptions  import InvalidTokenError 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from database import *
@@ -11,13 +14,33 @@ from passlib.context import CryptContext
 from models import User
 from typing import Annotated
 from jose import jwt
+from cache import CacheLocal
 import jwt
+import asyncio
 import http
+import os
+import threading
 
 SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Cache des utilisateurs authentifiés, indexé par user_id : évite une requête
+# SQL à chaque appel authentifié. Invalidé à chaque création/modification.
+utilisateurs_cache = CacheLocal(
+    "utilisateurs",
+    taille_max=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60"))
+)
+
+# Cache des clients, indexé par téléphone normalisé : identification de
+# l'appelant sans requête SQL. Seuls les clients trouvés sont mis en cache.
+clients_cache = CacheLocal(
+    "clients",
+    taille_max=int(os.getenv("CLIENT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("CLIENT_CACHE_TTL", "300"))
+)
+
 
 # Schéma OAuth2 pour l'authentification
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -31,6 +54,49 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+# Pool dédié et borné pour bcrypt : le hachage (~250 ms CPU) ne monopolise pas
+# le threadpool des endpoints. Au-delà de BCRYPT_MAX_PENDING opérations en
+# attente, les nouvelles demandes sont refusées avec un 503.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", str(BCRYPT_WORKERS * 4)))
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_places = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_MAX_PENDING)
+# Compteurs mis à jour depuis la boucle et depuis les threads des endpoints sync
+bcrypt_stats = {"operations": 0, "rejets": 0}
+_bcrypt_stats_verrou = threading.Lock()
+
+def _compter_bcrypt(cle: str):
+    with _bcrypt_stats_verrou:
+        bcrypt_stats[cle] += 1
+
+def statistiques_bcrypt() -> dict:
+    """Copie cohérente des compteurs bcrypt."""
+    with _bcrypt_stats_verrou:
+        return dict(bcrypt_stats)
+
+def _soumettre_bcrypt(fonction, *args):
+    """Soumet une opération bcrypt au pool dédié ou lève un 503 s'il est saturé."""
+    if not _bcrypt_places.acquire(blocking=False):
+        _compter_bcrypt("rejets")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service d'authentification saturé, veuillez réessayer",
+            headers={"Retry-After": "1"},
+        )
+    _compter_bcrypt("operations")
+    future = _bcrypt_executor.submit(fonction, *args)
+    future.add_done_callback(lambda _: _bcrypt_places.release())
+    return future
+
+async def verify_password_async(plain_password, hashed_password):
+    """verify_password exécuté sur le pool bcrypt, sans bloquer la boucle."""
+    return await asyncio.wrap_future(_soumettre_bcrypt(verify_password, plain_password, hashed_password))
+
+def hash_password_pool(password: str) -> str:
+    """hash_password exécuté sur le pool bcrypt (pour les endpoints sync)."""
+    return _soumettre_bcrypt(hash_password, password).result()
+
 def create_access_token(data: dict):
     to_encode = data.copy()
 
@@ -39,7 +105,7 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, str(SECRET_KEY), algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db : Session = Depends(get_db)):
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db : AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -55,11 +121,31 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db : S
     except InvalidTokenError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id==int(token_data.user_id)).first()
+    user_id = int(token_data.user_id)
+    user = utilisateurs_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        result = await db.execute(select(User).where(User.id==user_id))
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise credentials_exception
+        user = UserResponse.model_validate(db_user)
+        utilisateurs_cache.set(user_id, user)
     return user
 
+def invalider_utilisateur(user_id: int):
+    """
+    Retire un utilisateur du cache d'authentification.
+    À appeler après toute création ou modification d'un utilisateur.
+    """
+    utilisateurs_cache.invalider(user_id)
+
+def invalider_client(telephone_normalise: str):
+    """
+    Retire un client du cache de recherche par téléphone.
+    À appeler après toute création ou modification d'un client.
+    """
+    clients_cache.invalider(telephone_normalise)
+
 def role_required(roles):
     """
     Vérifie si l'utilisateur a un des rôles requis.